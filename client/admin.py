@@ -1,3 +1,30 @@
 from django.contrib import admin
 
+import client.models as models
+
 # Register your models here.
+
+
+class TacheRecuAdmin(admin.ModelAdmin):
+
+    list_display = (
+        'id',
+        'commande',
+        'etat',
+        'tentatives',
+        'date_add',
+        'date_debut',
+        'date_fin',
+    )
+    list_filter = (
+        'etat',
+        'date_add',
+    )
+    raw_id_fields = ('commande',)
+
+
+def _register(model, admin_class):
+    admin.site.register(model, admin_class)
+
+
+_register(models.TacheRecu, TacheRecuAdmin)
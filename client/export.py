@@ -0,0 +1,92 @@
+import logging
+import multiprocessing
+import os
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+
+from .recus import chemin_logo, empreinte, html_recu, recu_enregistre, sources_recu, url_logo
+from .utils import html_vers_pdf
+
+
+logger = logging.getLogger(__name__)
+
+
+class _Flux:
+    """Fichier en écriture seule pour zipfile : le contenu est récupéré au fur et à mesure.
+
+    Sans seek(), zipfile écrit des descripteurs de données après chaque membre
+    au lieu de revenir sur les en-têtes : l'archive peut partir sans être
+    gardée entière en mémoire.
+    """
+
+    def __init__(self):
+        self._morceaux = []
+        self._position = 0
+
+    def write(self, data):
+        self._morceaux.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def vider(self):
+        data = b"".join(self._morceaux)
+        self._morceaux = []
+        return data
+
+
+def pdfs_recus(commandes, processus=None):
+    """Génère (commande, pdf) dans l'ordre des commandes.
+
+    Un reçu déjà imprimé et à jour est relu tel quel ; les autres sont
+    convertis par xhtml2pdf dans `processus` processus fils. Au plus deux
+    conversions par processus sont en cours à la fois, pour que la mémoire
+    ne dépende pas du nombre de commandes.
+    """
+    processus = processus or getattr(settings, "RECEIPT_EXPORT_WORKERS", None) or os.cpu_count() or 1
+    logo, logo_local = url_logo(), chemin_logo()
+    en_cours = deque()
+
+    def sortir():
+        commande, pdf = en_cours.popleft()
+        if not isinstance(pdf, bytes):
+            pdf = pdf.result()
+        if pdf is None:
+            logger.warning("Reçu de la commande %s non converti", commande.id)
+        return commande, pdf
+
+    # spawn : les fils n'héritent ni des threads ni des connexions du serveur
+    with ProcessPoolExecutor(max_workers=processus, mp_context=multiprocessing.get_context("spawn")) as executor:
+        for commande in commandes:
+            detail_url, logo = sources_recu(commande, logo)
+            fichier = recu_enregistre(commande, empreinte(commande, detail_url, logo))
+            if fichier is not None:
+                with fichier.open("rb") as f:
+                    en_cours.append((commande, f.read()))
+            else:
+                html = html_recu(commande, detail_url, logo_local or logo)
+                en_cours.append((commande, executor.submit(html_vers_pdf, html)))
+
+            while len(en_cours) > 2 * processus:
+                yield sortir()
+        while en_cours:
+            yield sortir()
+
+
+def recus_zip(commandes, processus=None):
+    """Archive ZIP des reçus, produite morceau par morceau pour une StreamingHttpResponse."""
+    flux = _Flux()
+    with zipfile.ZipFile(flux, "w", zipfile.ZIP_STORED) as archive:
+        for commande, pdf in pdfs_recus(commandes, processus):
+            if pdf is not None:
+                archive.writestr(f"Recu_{commande.transaction_id or commande.id}.pdf", pdf)
+                yield flux.vider()
+    yield flux.vider()
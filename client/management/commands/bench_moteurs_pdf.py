@@ -0,0 +1,81 @@
+import statistics
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from client.recus import contexte_recu
+from customer.models import Commande, ProduitPanier
+from website.models import SiteInfo
+
+
+MOTEURS = {
+    "xhtml2pdf": "client.pdf.XHTML2PDFBackend",
+    "reportlab": "client.pdf.ReportlabBackend",
+    "playwright": "client.pdf.PlaywrightBackend",
+}
+
+
+def commande_fictive(nb_lignes):
+    """Commande non enregistrée de `nb_lignes` lignes figées, sans accès à la base."""
+    commande = Commande(
+        id=0, id_paiment="BENCH-0001", transaction_id="BENCH-TX-0001", prix_total=0, date_add=timezone.now(),
+    )
+    lignes = [
+        ProduitPanier(
+            id=i, commande=commande, quantite=1 + i % 4, en_promotion=i % 3 == 0,
+            nom_produit=f"Menu découverte n°{i} – formule midi avec boisson et dessert",
+            prix_unitaire=2500 + 150 * (i % 20),
+        )
+        for i in range(1, nb_lignes + 1)
+    ]
+    commande.prix_total = sum(ligne.total for ligne in lignes)
+    # Tient lieu de prefetch_related : produit_commande.all() renvoie ces lignes
+    commande._prefetched_objects_cache = {"produit_commande": lignes}
+    return commande
+
+
+class Command(BaseCommand):
+    help = "Compare latence, mémoire et taille des PDF de reçu selon le moteur et le nombre de lignes"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--moteurs", default="xhtml2pdf,reportlab,playwright")
+        parser.add_argument("--lignes", default="1,10,50,200")
+        parser.add_argument("--repetitions", type=int, default=5)
+
+    def handle(self, *args, **options):
+        site = SiteInfo.objects.order_by("-date_add").first()
+        logo_local = None
+        if site is not None and site.logo:
+            try:
+                logo_local = site.logo.path
+            except (NotImplementedError, ValueError):
+                pass
+
+        self.stdout.write(f"{'moteur':<11}{'lignes':>7}{'médiane ms':>12}{'max ms':>9}{'pic Mo':>9}{'taille Ko':>11}")
+        for nom in options["moteurs"].split(","):
+            moteur = import_string(MOTEURS[nom])()
+            for nb_lignes in map(int, options["lignes"].split(",")):
+                commande = commande_fictive(nb_lignes)
+                contexte = contexte_recu(commande, "https://www.cooldeal-ci.com/deals/commande-reçu-detail/0/", "", logo_local)
+                moteur.rendre(contexte)  # préchauffage (imports, polices, navigateur)
+
+                durees = []
+                for _ in range(options["repetitions"]):
+                    debut = time.perf_counter()
+                    pdf = moteur.rendre(contexte)
+                    durees.append(time.perf_counter() - debut)
+
+                # Mesure mémoire à part : tracemalloc ralentit fortement l'exécution
+                tracemalloc.start()
+                moteur.rendre(contexte)
+                pic = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+
+                self.stdout.write(
+                    f"{nom:<11}{nb_lignes:>7}{statistics.median(durees) * 1000:>12.1f}{max(durees) * 1000:>9.1f}"
+                    f"{pic / 2 ** 20:>9.1f}{len(pdf) / 1024:>11.1f}"
+                )
+        self.stdout.write("Le pic mémoire ne compte que le processus Python (pas le Chromium de playwright).")
@@ -0,0 +1,34 @@
+import timeit
+
+from django.core.management.base import BaseCommand
+
+from client.utils import qrcode_encode
+
+
+class Command(BaseCommand):
+    help = "Coût par appel de la génération des QR codes des reçus : PNG, SVG, avec et sans cache"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--appels", type=int, default=200)
+
+    def handle(self, *args, **options):
+        appels = options["appels"]
+        sans_cache = qrcode_encode.__wrapped__
+        compteur = iter(range(10 ** 9))
+
+        def url_unique():
+            return f"https://www.cooldeal-ci.com/deals/commande-reçu-detail/{next(compteur)}/"
+
+        url = url_unique()
+        qrcode_encode(url)
+        qrcode_encode(url, format="svg")
+        mesures = [
+            ("png sans cache", lambda: sans_cache(url_unique())),
+            ("svg sans cache", lambda: sans_cache(url_unique(), format="svg")),
+            ("png en cache", lambda: qrcode_encode(url)),
+            ("svg en cache", lambda: qrcode_encode(url, format="svg")),
+        ]
+        for nom, appel in mesures:
+            duree = timeit.timeit(appel, number=appels)
+            self.stdout.write(f"{nom:<16} {duree / appels * 1e6:10.1f} µs/appel")
+        self.stdout.write(str(qrcode_encode.cache_info()))
@@ -0,0 +1,82 @@
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.template.loader import render_to_string
+from django.urls import reverse
+
+from client.navigateur import MARGES, PoolNavigateur
+from client.utils import qrcode_base64
+from customer.models import Commande
+
+
+def imprimer_avec_lancement(html):
+    """Ancien comportement de invoice_pdf : un Chromium lancé par reçu."""
+    from playwright.sync_api import sync_playwright
+
+    with sync_playwright() as p:
+        browser = p.chromium.launch()
+        page = browser.new_page()
+        page.set_content(html, wait_until="load")
+        pdf = page.pdf(format="A4", print_background=True, margin=MARGES)
+        browser.close()
+    return pdf
+
+
+class Command(BaseCommand):
+    help = "Compare le débit et la latence de l'impression des reçus : lancement par requête contre pool"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--commande", type=int, help="Commande à imprimer (la plus récente par défaut)")
+        parser.add_argument("--requetes", type=int, default=20)
+        parser.add_argument("--concurrence", type=int, default=4)
+        parser.add_argument("--taille", type=int, default=2, help="Onglets du pool")
+        parser.add_argument("--mode", choices=["lancement", "pool", "tous"], default="tous")
+
+    def handle(self, *args, **options):
+        commandes = Commande.objects.order_by("-date_add")
+        if options["commande"]:
+            commandes = commandes.filter(id=options["commande"])
+        commande = commandes.first()
+        if commande is None:
+            raise CommandError("Aucune commande à imprimer.")
+
+        html = render_to_string("receipt.html", {
+            "order_id": commande,
+            "produits_commande": commande.produit_commande.all(),
+            "qr_code": qrcode_base64(reverse("commande-reçu-detail", args=[commande.id])),
+            "logo": "",
+        })
+
+        modes = ["lancement", "pool"] if options["mode"] == "tous" else [options["mode"]]
+        for mode in modes:
+            if mode == "pool":
+                pool = PoolNavigateur(taille=options["taille"], attente_max=options["requetes"])
+                pool.imprimer(html)  # démarrage à froid exclu de la mesure
+                imprimer = pool.imprimer
+            else:
+                pool, imprimer = None, imprimer_avec_lancement
+            try:
+                self.mesurer(mode, imprimer, html, options["requetes"], options["concurrence"])
+            finally:
+                if pool is not None:
+                    pool.fermer()
+
+    def mesurer(self, mode, imprimer, html, requetes, concurrence):
+        def chronometrer(_):
+            debut = time.perf_counter()
+            imprimer(html)
+            return time.perf_counter() - debut
+
+        debut = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrence) as executor:
+            latences = sorted(executor.map(chronometrer, range(requetes)))
+        duree = time.perf_counter() - debut
+
+        p95 = latences[min(len(latences) - 1, int(len(latences) * 0.95))]
+        self.stdout.write(
+            f"{mode:<10} {requetes / duree:6.2f} reçus/s  "
+            f"p50 {statistics.median(latences) * 1000:7.0f} ms  "
+            f"p95 {p95 * 1000:7.0f} ms  max {latences[-1] * 1000:7.0f} ms"
+        )
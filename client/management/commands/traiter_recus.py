@@ -0,0 +1,28 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+
+from client.taches import metriques, traiter_file
+
+
+class Command(BaseCommand):
+    help = "Génère les reçus PDF en attente (worker de la file TacheRecu)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--une-fois", action="store_true", help="Vide la file puis s'arrête")
+        parser.add_argument("--intervalle", type=float, default=2.0, help="Pause (s) quand la file est vide")
+        parser.add_argument("--metriques", action="store_true", help="Affiche l'état de la file et quitte")
+
+    def handle(self, *args, **options):
+        if options["metriques"]:
+            self.stdout.write(json.dumps(metriques(), indent=2))
+            return
+
+        while True:
+            traitees = traiter_file()
+            if traitees:
+                self.stdout.write(f"{traitees} reçu(s) traité(s).")
+            if options["une_fois"]:
+                return
+            time.sleep(options["intervalle"])
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('client', '0002_delete_listesouhait'),
+        ('customer', '0011_commande_recu_empreinte'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TacheRecu',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('etat', models.CharField(choices=[('attente', 'En attente'), ('en_cours', 'En cours'), ('terminee', 'Terminée'), ('echec', 'Échec')], default='attente', max_length=10)),
+                ('tentatives', models.PositiveSmallIntegerField(default=0)),
+                ('erreur', models.TextField(blank=True)),
+                ('date_add', models.DateTimeField(auto_now_add=True)),
+                ('date_debut', models.DateTimeField(blank=True, null=True)),
+                ('date_fin', models.DateTimeField(blank=True, null=True)),
+                ('commande', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='taches_recu', to='customer.commande')),
+            ],
+            options={
+                'verbose_name': 'Tâche reçu',
+                'verbose_name_plural': 'Tâches reçus',
+                'indexes': [models.Index(fields=['etat', 'date_add'], name='tache_recu_file_idx')],
+            },
+        ),
+    ]
@@ -1,3 +1,34 @@
 from django.db import models
 
 # Create your models here.
+
+
+class TacheRecu(models.Model):
+    """Génération d'un reçu PDF en file d'attente, traitée par `manage.py traiter_recus`."""
+
+    EN_ATTENTE = 'attente'
+    EN_COURS = 'en_cours'
+    TERMINEE = 'terminee'
+    ECHEC = 'echec'
+    ETATS = [
+        (EN_ATTENTE, 'En attente'),
+        (EN_COURS, 'En cours'),
+        (TERMINEE, 'Terminée'),
+        (ECHEC, 'Échec'),
+    ]
+
+    commande = models.ForeignKey('customer.Commande', related_name="taches_recu", on_delete=models.CASCADE)
+    etat = models.CharField(max_length=10, choices=ETATS, default=EN_ATTENTE)
+    tentatives = models.PositiveSmallIntegerField(default=0)
+    erreur = models.TextField(blank=True)
+    date_add = models.DateTimeField(auto_now_add=True)
+    date_debut = models.DateTimeField(null=True, blank=True)
+    date_fin = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Tâche reçu'
+        verbose_name_plural = 'Tâches reçus'
+        indexes = [models.Index(fields=['etat', 'date_add'], name='tache_recu_file_idx')]
+
+    def __str__(self):
+        return f"Reçu commande {self.commande_id} ({self.etat})"
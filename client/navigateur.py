@@ -0,0 +1,160 @@
+import asyncio
+import atexit
+import logging
+import os
+import threading
+
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+MARGES = {"top": "10mm", "right": "10mm", "bottom": "10mm", "left": "10mm"}
+
+
+class PoolSature(Exception):
+    """Trop d'impressions en cours ou en attente."""
+
+
+class PoolNavigateur:
+    """Chromium gardé chaud pour imprimer les reçus en PDF.
+
+    Le navigateur vit dans un thread dédié (boucle asyncio) avec au plus
+    `taille` onglets réutilisés d'une impression à l'autre. Les threads du
+    serveur WSGI y soumettent leur HTML et attendent le PDF au plus `delai`
+    secondes ; au-delà de `attente_max` impressions en cours, PoolSature est
+    levée plutôt que d'empiler les requêtes. Si Chromium plante, il est
+    relancé à l'impression suivante.
+    """
+
+    def __init__(self, taille=2, attente_max=16, delai=30):
+        self.taille = taille
+        self.attente_max = attente_max
+        self.delai = delai
+        self._verrou = threading.Lock()
+        self._en_cours = 0
+        self._pid = None
+        self._boucle = None
+        self._thread = None
+
+    def _demarrer(self):
+        # Après un fork (gunicorn --preload), le thread du parent n'existe plus
+        if self._pid == os.getpid() and self._thread.is_alive():
+            return
+        self._pid = os.getpid()
+        self._playwright = None
+        self._navigateur = None
+        self._generation = 0
+        self._libres = []
+        self._boucle = asyncio.new_event_loop()
+        self._places = None
+        self._lancement = None
+        self._thread = threading.Thread(target=self._boucle.run_forever, name="pool-pdf", daemon=True)
+        self._thread.start()
+
+    async def _lancer(self):
+        from playwright.async_api import async_playwright
+
+        if self._playwright is None:
+            self._playwright = await async_playwright().start()
+        if self._navigateur is not None:
+            logger.warning("Chromium ne répond plus, relance du navigateur")
+            try:
+                await self._navigateur.close()
+            except Exception:
+                pass
+        self._navigateur = await self._playwright.chromium.launch()
+        self._generation += 1
+        self._libres = []
+
+    async def _prendre_onglet(self):
+        async with self._lancement:
+            if self._navigateur is None or not self._navigateur.is_connected():
+                await self._lancer()
+            if self._libres:
+                return self._libres.pop()
+            return self._generation, await self._navigateur.new_page()
+
+    async def _imprimer(self, html):
+        if self._places is None:
+            # Créés dans la boucle du thread dédié
+            self._places = asyncio.Semaphore(self.taille)
+            self._lancement = asyncio.Lock()
+
+        async with self._places:
+            generation, onglet = await self._prendre_onglet()
+            try:
+                await onglet.set_content(html, wait_until="load", timeout=self.delai * 1000)
+                pdf = await onglet.pdf(format="A4", print_background=True, margin=MARGES)
+            except BaseException:
+                # Onglet bloqué ou planté : il n'est pas remis dans le pool
+                try:
+                    await onglet.close()
+                except Exception:
+                    pass
+                raise
+            if generation == self._generation:
+                self._libres.append((generation, onglet))
+            return pdf
+
+    def imprimer(self, html):
+        """Imprime le HTML en PDF A4 et retourne les octets."""
+        with self._verrou:
+            if self._en_cours >= self.attente_max:
+                raise PoolSature()
+            self._en_cours += 1
+            self._demarrer()
+            boucle = self._boucle
+        try:
+            futur = asyncio.run_coroutine_threadsafe(self._imprimer(html), boucle)
+            try:
+                return futur.result(timeout=self.delai)
+            except TimeoutError:
+                futur.cancel()
+                raise
+        finally:
+            with self._verrou:
+                self._en_cours -= 1
+
+    @property
+    def en_cours(self):
+        return self._en_cours
+
+    def fermer(self):
+        with self._verrou:
+            if self._boucle is None or self._pid != os.getpid():
+                return
+            boucle, self._boucle, self._pid = self._boucle, None, None
+
+        async def arreter():
+            if self._navigateur is not None:
+                await self._navigateur.close()
+            if self._playwright is not None:
+                await self._playwright.stop()
+
+        try:
+            asyncio.run_coroutine_threadsafe(arreter(), boucle).result(timeout=10)
+        except Exception:
+            logger.exception("Arrêt du navigateur PDF")
+        boucle.call_soon_threadsafe(boucle.stop)
+
+
+_pool = None
+_pool_verrou = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    with _pool_verrou:
+        if _pool is None:
+            _pool = PoolNavigateur(
+                taille=getattr(settings, "RECEIPT_PDF_POOL_SIZE", 2),
+                attente_max=getattr(settings, "RECEIPT_PDF_QUEUE_MAX", 16),
+                delai=getattr(settings, "RECEIPT_PDF_TIMEOUT", 30),
+            )
+            atexit.register(_pool.fermer)
+    return _pool
+
+
+def imprimer_pdf(html):
+    return get_pool().imprimer(html)
@@ -0,0 +1,132 @@
+from io import BytesIO
+
+from django.conf import settings
+from django.template.loader import render_to_string
+from django.utils.html import escape
+from django.utils.module_loading import import_string
+
+from .navigateur import imprimer_pdf
+from .utils import html_vers_pdf, qrcode_encode
+
+
+class BasePDFBackend:
+    """Moteur d'impression des reçus, choisi par le réglage RECEIPT_PDF_BACKEND.
+
+    `contexte` contient order_id (la commande), produits_commande,
+    detail_url (cible du QR code), logo (URL) et logo_local (chemin ou None).
+    """
+
+    nom = None
+
+    def rendre(self, contexte):
+        """Retourne les octets du PDF."""
+        raise NotImplementedError
+
+
+class HTMLPDFBackend(BasePDFBackend):
+    """Moteurs qui impriment receipt.html."""
+
+    format_qr = "png"
+
+    def html(self, contexte):
+        return render_to_string("receipt.html", dict(
+            contexte,
+            qr_code=qrcode_encode(contexte["detail_url"], format=self.format_qr),
+            qr_mime="image/svg+xml" if self.format_qr == "svg" else "image/png",
+        ))
+
+
+class PlaywrightBackend(HTMLPDFBackend):
+    """Chromium du pool (client.navigateur) : rendu fidèle au navigateur, le plus lourd."""
+
+    nom = "playwright"
+    format_qr = "svg"
+
+    def rendre(self, contexte):
+        return imprimer_pdf(self.html(contexte))
+
+
+class XHTML2PDFBackend(HTMLPDFBackend):
+    """xhtml2pdf (pisa) : pur Python, CSS partiel, logo lu sur disque."""
+
+    nom = "xhtml2pdf"
+
+    def rendre(self, contexte):
+        contexte = dict(contexte, logo=contexte.get("logo_local") or contexte["logo"])
+        pdf = html_vers_pdf(self.html(contexte))
+        if pdf is None:
+            raise ValueError(f"xhtml2pdf n'a pas pu convertir le reçu {contexte['order_id'].id}")
+        return pdf
+
+
+class ReportlabBackend(BasePDFBackend):
+    """Reçu dessiné directement avec reportlab, sans HTML, QR code vectoriel."""
+
+    nom = "reportlab"
+
+    def rendre(self, contexte):
+        from reportlab.graphics.barcode.qr import QrCodeWidget
+        from reportlab.graphics.shapes import Drawing
+        from reportlab.lib import colors
+        from reportlab.lib.pagesizes import A4
+        from reportlab.lib.styles import getSampleStyleSheet
+        from reportlab.lib.units import mm
+        from reportlab.platypus import Image, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+        commande = contexte["order_id"]
+        styles = getSampleStyleSheet()
+        elements = []
+
+        if contexte.get("logo_local"):
+            elements.append(Image(contexte["logo_local"], width=30 * mm, height=15 * mm, kind="proportional"))
+        elements.append(Paragraph("Reçu de Commande", styles["Title"]))
+        for libelle, valeur in (
+            ("ID Opération", commande.id_paiment),
+            ("ID Transaction", commande.transaction_id),
+            ("Date de Paiement", commande.date_add.strftime("%d/%m/%Y %H:%M") if commande.date_add else ""),
+            ("Total Payé", f"{commande.prix_total:.0f} F CFA"),
+        ):
+            elements.append(Paragraph(f"<b>{libelle} :</b> {escape(valeur or '')}", styles["Normal"]))
+        elements.append(Spacer(1, 8 * mm))
+
+        lignes = [["Produit", "Quantité", "Prix Unitaire", "Total"]]
+        for ligne in contexte["produits_commande"]:
+            lignes.append([
+                Paragraph(escape(ligne.nom_produit or ""), styles["Normal"]),
+                ligne.quantite,
+                f"{ligne.prix_unitaire or 0:.0f} F CFA",
+                f"{ligne.total:.0f} F CFA",
+            ])
+        tableau = Table(lignes, colWidths=[80 * mm, 25 * mm, 35 * mm, 35 * mm], repeatRows=1)
+        tableau.setStyle(TableStyle([
+            ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+            ("LINEBELOW", (0, 0), (-1, 0), 0.5, colors.black),
+            ("LINEBELOW", (0, 1), (-1, -1), 0.25, colors.lightgrey),
+            ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
+        ]))
+        elements += [tableau, Spacer(1, 8 * mm), Paragraph("Scannez pour vérifier :", styles["Normal"])]
+
+        qr = QrCodeWidget(contexte["detail_url"])
+        x1, y1, x2, y2 = qr.getBounds()
+        taille = 40 * mm
+        dessin = Drawing(taille, taille, transform=[taille / (x2 - x1), 0, 0, taille / (y2 - y1), 0, 0])
+        dessin.add(qr)
+        elements.append(dessin)
+
+        sortie = BytesIO()
+        marge = 10 * mm
+        SimpleDocTemplate(
+            sortie, pagesize=A4, leftMargin=marge, rightMargin=marge, topMargin=marge, bottomMargin=marge,
+            title=f"Reçu {commande.transaction_id or commande.id}",
+        ).build(elements)
+        return sortie.getvalue()
+
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        _backend = import_string(getattr(settings, 'RECEIPT_PDF_BACKEND', 'client.pdf.PlaywrightBackend'))()
+    return _backend
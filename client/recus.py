@@ -0,0 +1,109 @@
+import hashlib
+import json
+import os
+from urllib.parse import urljoin
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.urls import reverse
+
+from website.models import SiteInfo
+
+from .pdf import HTMLPDFBackend, get_backend
+
+
+# À incrémenter quand receipt.html change : les reçus déjà générés sont alors refaits
+VERSION_RECU = 2
+
+
+def empreinte(commande, url_detail, logo):
+    """Hash du contenu du reçu : moteur PDF, commande, lignes figées, QR code et logo."""
+    # .all() profite d'un prefetch_related('produit_commande') (export en lot)
+    # Montants en float : une instance fraîchement créée peut encore porter des int
+    lignes = [
+        (ligne.nom_produit, ligne.quantite, None if ligne.prix_unitaire is None else float(ligne.prix_unitaire), ligne.en_promotion)
+        for ligne in sorted(commande.produit_commande.all(), key=lambda ligne: ligne.id)
+    ]
+    contenu = json.dumps([
+        VERSION_RECU,
+        get_backend().nom,
+        commande.id,
+        commande.id_paiment,
+        commande.transaction_id,
+        float(commande.prix_total),
+        commande.date_add.isoformat() if commande.date_add else None,
+        lignes,
+        url_detail,
+        logo,
+    ], ensure_ascii=False, default=str)
+    return hashlib.sha256(contenu.encode('utf-8')).hexdigest()
+
+
+def recu_enregistre(commande, cle):
+    """Le PDF déjà généré pour cette empreinte, ou None s'il est absent ou périmé."""
+    if commande.recu_empreinte != cle or not commande.recu_paiement:
+        return None
+    if not commande.recu_paiement.storage.exists(commande.recu_paiement.name):
+        return None
+    return commande.recu_paiement
+
+
+def enregistrer_recu(commande, cle, pdf):
+    """Remplace le PDF de la commande par celui de l'empreinte `cle`."""
+    if commande.recu_paiement:
+        commande.recu_paiement.delete(save=False)
+    commande.recu_paiement.save(f"recu_{commande.id}_{cle[:16]}.pdf", ContentFile(pdf), save=False)
+    commande.recu_empreinte = cle
+    commande.save(update_fields=['recu_paiement', 'recu_empreinte', 'date_update'])
+    return commande.recu_paiement
+
+
+def url_logo():
+    return urljoin(settings.SITE_URL, SiteInfo.objects.latest('date_add').logo.url)
+
+
+def sources_recu(commande, logo=None):
+    """URL du QR code et du logo, absolues sur SITE_URL pour être identiques hors requête."""
+    detail_url = urljoin(settings.SITE_URL, reverse("commande-reçu-detail", args=[commande.id]))
+    return detail_url, logo or url_logo()
+
+
+def chemin_logo():
+    """Le logo sur disque, pour les moteurs qui ne doivent pas le télécharger à chaque reçu."""
+    logo = SiteInfo.objects.latest('date_add').logo
+    try:
+        if os.path.exists(logo.path):
+            return logo.path
+    except (NotImplementedError, ValueError):
+        pass
+    return None
+
+
+def contexte_recu(commande, detail_url, logo, logo_local=None):
+    return {
+        "order_id": commande,
+        "produits_commande": commande.produit_commande.all(),
+        "detail_url": detail_url,
+        "logo": logo,
+        "logo_local": logo_local,
+    }
+
+
+def html_recu(commande, detail_url, logo):
+    return HTMLPDFBackend().html(contexte_recu(commande, detail_url, logo))
+
+
+def imprimer_recu(commande, detail_url, logo, cle):
+    backend = get_backend()
+    contexte = contexte_recu(commande, detail_url, logo, chemin_logo() if backend.nom != "playwright" else None)
+    return enregistrer_recu(commande, cle, backend.rendre(contexte))
+
+
+def generer_recu(commande):
+    """Le PDF à jour de la commande, imprimé seulement si son contenu a changé."""
+    detail_url, logo = sources_recu(commande)
+    cle = empreinte(commande, detail_url, logo)
+    fichier = recu_enregistre(commande, cle)
+    if fichier is None:
+        fichier = imprimer_recu(commande, detail_url, logo, cle)
+    return fichier
@@ -0,0 +1,117 @@
+import datetime
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from .models import TacheRecu
+from .recus import generer_recu
+
+
+logger = logging.getLogger(__name__)
+
+# Une tâche « en cours » depuis plus longtemps a perdu son worker
+DELAI_ABANDON = datetime.timedelta(minutes=10)
+
+
+def mettre_en_file(commande):
+    """Ajoute la génération du reçu à la file, après validation de la transaction courante."""
+    def creer():
+        if not TacheRecu.objects.filter(commande=commande, etat__in=[TacheRecu.EN_ATTENTE, TacheRecu.EN_COURS]).exists():
+            TacheRecu.objects.create(commande=commande)
+    transaction.on_commit(creer)
+
+
+def tache_en_attente(commande):
+    """La tâche non terminée de la commande, si un worker doit encore s'en charger."""
+    return TacheRecu.objects.filter(
+        commande=commande, etat__in=[TacheRecu.EN_ATTENTE, TacheRecu.EN_COURS],
+    ).order_by('-date_add').first()
+
+
+def prendre_tache():
+    """Réserve la plus ancienne tâche en attente pour ce worker, ou retourne None.
+
+    La réservation est un UPDATE conditionnel : plusieurs workers peuvent
+    tourner en parallèle sans traiter deux fois la même tâche. Les tâches
+    abandonnées par un worker sont remises en attente tant qu'il leur reste
+    des tentatives.
+    """
+    maintenant = timezone.now()
+    # Un reçu qui tue ou bloque le worker à chaque essai finit en échec
+    abandonnees = TacheRecu.objects.filter(etat=TacheRecu.EN_COURS, date_debut__lt=maintenant - DELAI_ABANDON)
+    maximum = getattr(settings, 'RECEIPT_MAX_ATTEMPTS', 3)
+    abandonnees.filter(tentatives__gte=maximum).update(
+        etat=TacheRecu.ECHEC, erreur="Worker perdu pendant la génération", date_fin=maintenant,
+    )
+    abandonnees.filter(tentatives__lt=maximum).update(etat=TacheRecu.EN_ATTENTE)
+    for tache_id in TacheRecu.objects.filter(etat=TacheRecu.EN_ATTENTE).order_by('date_add').values_list('id', flat=True)[:10]:
+        reservee = TacheRecu.objects.filter(id=tache_id, etat=TacheRecu.EN_ATTENTE).update(
+            etat=TacheRecu.EN_COURS, date_debut=maintenant, tentatives=F('tentatives') + 1,
+        )
+        if reservee:
+            return TacheRecu.objects.select_related('commande').get(id=tache_id)
+    return None
+
+
+def traiter(tache):
+    try:
+        generer_recu(tache.commande)
+    except Exception as exc:
+        logger.exception("Génération du reçu de la commande %s", tache.commande_id)
+        tache.erreur = str(exc)
+        if tache.tentatives >= getattr(settings, 'RECEIPT_MAX_ATTEMPTS', 3):
+            tache.etat = TacheRecu.ECHEC
+            tache.date_fin = timezone.now()
+        else:
+            tache.etat = TacheRecu.EN_ATTENTE
+    else:
+        tache.etat = TacheRecu.TERMINEE
+        tache.erreur = ''
+        tache.date_fin = timezone.now()
+    tache.save(update_fields=['etat', 'erreur', 'date_fin'])
+
+
+def terminer(commande):
+    """Le reçu a été imprimé à la demande : les tâches en attente n'ont plus lieu d'être."""
+    TacheRecu.objects.filter(commande=commande, etat=TacheRecu.EN_ATTENTE).update(
+        etat=TacheRecu.TERMINEE, date_fin=timezone.now(),
+    )
+
+
+def traiter_file(limite=None):
+    """Traite les tâches en attente ; retourne le nombre de tâches traitées."""
+    traitees = 0
+    while limite is None or traitees < limite:
+        tache = prendre_tache()
+        if tache is None:
+            break
+        traiter(tache)
+        traitees += 1
+    return traitees
+
+
+def metriques(depuis=datetime.timedelta(hours=24)):
+    """Profondeur de la file et latences (secondes) des tâches terminées sur la période."""
+    maintenant = timezone.now()
+    etats = dict.fromkeys([etat for etat, _ in TacheRecu.ETATS], 0)
+    taches = TacheRecu.objects.filter(
+        Q(etat__in=[TacheRecu.EN_ATTENTE, TacheRecu.EN_COURS]) | Q(date_add__gte=maintenant - depuis)
+    )
+    for etat, nombre in taches.order_by().values_list('etat').annotate(n=Count('id')):
+        etats[etat] = nombre
+
+    plus_ancienne = TacheRecu.objects.filter(etat=TacheRecu.EN_ATTENTE).order_by('date_add').values_list('date_add', flat=True).first()
+    terminees = TacheRecu.objects.filter(etat=TacheRecu.TERMINEE, date_fin__gte=maintenant - depuis, date_debut__isnull=False)
+    latences = sorted((fin - ajout).total_seconds() for ajout, fin in terminees.values_list('date_add', 'date_fin'))
+    durees = [(fin - debut).total_seconds() for debut, fin in terminees.values_list('date_debut', 'date_fin')]
+
+    return {
+        'file': etats,
+        'attente_plus_ancienne': (maintenant - plus_ancienne).total_seconds() if plus_ancienne else 0,
+        'latence_moyenne': sum(latences) / len(latences) if latences else None,
+        'latence_p95': latences[min(len(latences) - 1, int(len(latences) * 0.95))] if latences else None,
+        'duree_moyenne': sum(durees) / len(durees) if durees else None,
+    }
@@ -1,10 +1,14 @@
+import datetime
 import unittest
 from unittest.mock import MagicMock, patch
-from customer.models import Commande, Customer
+from customer.models import Commande, Customer, ProduitPanier
+from client.navigateur import PoolNavigateur, PoolSature
 from client.views import avis, commande_detail, evaluation, profil, commande, parametre, invoice_pdf, souhait, suivie_commande
 from shop.models import CategorieEtablissement, CategorieProduit, Etablissement, Produit, Favorite
+from shop.commandes import indexer_commande
 import pytest
 from django.urls import reverse
+from django.utils import timezone
 from django.contrib.auth.models import User
 from django.core.files.uploadedfile import SimpleUploadedFile
 
@@ -78,19 +82,18 @@ class ProfilLogicTest(unittest.TestCase):
     @patch('client.views.Commande')
     def test_commande_data_formatting_loop(self, mock_commande, mock_pp, mock_render):
 
-        # Une fausse commande
+        # Une fausse commande, lignes déjà chargées par le prefetch (to_attr='lignes')
         mock_commande_instance = MagicMock()
-        mock_commande.objects.filter.return_value.order_by.return_value = [mock_commande_instance]
-
-        # Simule filter().select_related()
-        mock_qs = MagicMock()
-        mock_qs.select_related.return_value = []
-        mock_pp.objects.filter.return_value = mock_qs
+        mock_commande_instance.lignes = ['ligne']
+        mock_commande.objects.filter.return_value.order_by.return_value.prefetch_related.return_value = [mock_commande_instance]
 
         commande(self.request)
 
         context = mock_render.call_args[0][2]
         self.assertIn('commandes_data', context)
+        self.assertEqual(context['commandes_data'], [{'commande': mock_commande_instance, 'produits': ['ligne']}])
+        # Plus de requête de lignes par commande
+        mock_pp.objects.filter.assert_not_called()
 
     # ---------- VUE : PARAMETRE ----------
 
@@ -415,6 +418,38 @@ class TestCustomerFonctionnel:
         content = response.content.decode().lower()
         assert "aucune commande" in content or "pas de commande" in content or "vide" in content
 
+    def test_commande_requetes_constantes(self, client, user_and_customer, etablissement_and_categories, django_assert_max_num_queries):
+        user, customer = user_and_customer
+        produit = etablissement_and_categories["produit"]
+        for i in range(10):
+            commande = Commande.objects.create(customer=customer, prix_total=1000, transaction_id=f"TX-HIST-{i}")
+            for _ in range(3):
+                ProduitPanier.objects.create(commande=commande, produit=produit, nom_produit="Produit Favori", prix_unitaire=1000)
+        client.force_login(user)
+
+        # Session, utilisateur, client, COUNT, page, lignes (+ 5 des context processors) : pas une requête par commande
+        with django_assert_max_num_queries(11):
+            response = client.get(reverse("commande"))
+        assert len(response.context["commandes_data"]) == 10
+        assert all(len(data["produits"]) == 3 for data in response.context["commandes_data"])
+
+    def test_commande_recherche_par_date(self, client, user_and_customer):
+        user, customer = user_and_customer
+        ancienne = Commande.objects.create(customer=customer, prix_total=1000, transaction_id="TX-ANCIENNE")
+        Commande.objects.filter(id=ancienne.id).update(date_add=timezone.make_aware(datetime.datetime(2024, 3, 14, 10, 0)))
+        Commande.objects.create(customer=customer, prix_total=1000, transaction_id="TX-RECENTE")
+        client.force_login(user)
+
+        for saisie in ("14/03/2024", "2024-03-14", "03/2024", "2024"):
+            response = client.get(reverse("commande"), {"q": saisie})
+            assert [d["commande"].id for d in response.context["commandes_data"]] == [ancienne.id], saisie
+
+        # Fin de période hors calendrier : recherche ordinaire, pas d'erreur
+        for saisie in ("9999", "12/9999", "31/12/9999"):
+            response = client.get(reverse("commande"), {"q": saisie})
+            assert response.status_code == 200, saisie
+            assert response.context["commandes_data"] == [], saisie
+
     def test_commande_anonyme_redirection(self):
         response = self.client.get(reverse("commande"))
         assert response.status_code == 302
@@ -713,3 +748,287 @@ class TestIntegration:
         assert response.status_code == 302 and "login" in response.url.lower()
         response = client.get(reverse("liste-souhait"))
         assert response.status_code == 302 and "login" in response.url.lower()
+
+
+class FauxOnglet:
+
+    def __init__(self, erreur=None):
+        self.erreur = erreur
+        self.ferme = False
+
+    async def set_content(self, html, **kwargs):
+        if self.erreur:
+            raise self.erreur
+
+    async def pdf(self, **kwargs):
+        return b"%PDF-1.4"
+
+    async def close(self):
+        self.ferme = True
+
+
+class FauxNavigateur:
+
+    def __init__(self, onglets):
+        self.onglets = onglets
+        self.ouverts = []
+
+    def is_connected(self):
+        return True
+
+    async def new_page(self):
+        onglet = self.onglets.pop(0)
+        self.ouverts.append(onglet)
+        return onglet
+
+    async def close(self):
+        pass
+
+
+class PoolNavigateurTest(unittest.TestCase):
+    """Le Chromium du pool est lancé une fois et ses onglets réutilisés."""
+
+    def setUp(self):
+        self.navigateur = FauxNavigateur([FauxOnglet(), FauxOnglet()])
+        playwright = MagicMock()
+
+        async def lancer():
+            return self.navigateur
+
+        async def demarrer():
+            return playwright
+
+        async def arreter():
+            pass
+
+        playwright.chromium.launch = lancer
+        playwright.stop = arreter
+        patcher = patch('playwright.async_api.async_playwright')
+        patcher.start().return_value.start = demarrer
+        self.addCleanup(patcher.stop)
+        self.pool = PoolNavigateur(taille=1)
+        self.addCleanup(self.pool.fermer)
+
+    def test_onglet_reutilise(self):
+        self.assertEqual(self.pool.imprimer("<p>1</p>"), b"%PDF-1.4")
+        self.assertEqual(self.pool.imprimer("<p>2</p>"), b"%PDF-1.4")
+        self.assertEqual(len(self.navigateur.ouverts), 1)
+
+    def test_onglet_en_echec_remplace(self):
+        self.navigateur.onglets[0].erreur = RuntimeError("Target crashed")
+        with self.assertRaises(RuntimeError):
+            self.pool.imprimer("<p>1</p>")
+        self.assertTrue(self.navigateur.ouverts[0].ferme)
+        self.assertEqual(self.pool.imprimer("<p>2</p>"), b"%PDF-1.4")
+        self.assertEqual(len(self.navigateur.ouverts), 2)
+
+    def test_file_pleine(self):
+        pool = PoolNavigateur(attente_max=0)
+        with self.assertRaises(PoolSature):
+            pool.imprimer("<p>1</p>")
+
+    @patch('client.views.tache_en_attente', return_value=None)
+    @patch('client.views.recu_enregistre', return_value=None)
+    @patch('client.views.empreinte', return_value="abc")
+    @patch('client.views.sources_recu', return_value=("https://cooldeal.test/r/1/", "https://cooldeal.test/logo.png"))
+    @patch('client.views.get_object_or_404')
+    def test_invoice_pdf_pool_indisponible(self, mock_get_obj, *mocks):
+        request = MagicMock()
+        request.method = 'GET'
+        request.META = {}
+        mock_get_obj.return_value.customer_id = request.user.customer.id
+        mock_get_obj.return_value.id = 1
+
+        # Pool saturé, impression trop longue ou Chromium planté : 503 à réessayer, jamais une erreur 500
+        for erreur in (PoolSature, TimeoutError, RuntimeError("Target crashed")):
+            with self.subTest(erreur=erreur), patch('client.views.imprimer_recu', side_effect=erreur):
+                response = invoice_pdf(request, order_id=1)
+                self.assertEqual(response.status_code, 503)
+                self.assertEqual(response["Retry-After"], "5")
+
+
+@pytest.mark.django_db
+class TestRecuEnCache:
+    """Un reçu n'est imprimé qu'une fois tant que la commande ne change pas."""
+
+    @pytest.fixture(autouse=True)
+    def media(self, settings, tmp_path):
+        settings.MEDIA_ROOT = tmp_path
+
+    @pytest.fixture
+    def commande(self, db):
+        from website.models import SiteInfo
+        from customer.models import ProduitPanier
+
+        SiteInfo.objects.create(titre="Cool Deal")
+        user = User.objects.create_user(username="recu", password="pass")
+        customer = Customer.objects.create(user=user, adresse="Rue", contact_1="0102030405")
+        categorie = CategorieEtablissement.objects.create(nom="Resto", description="d")
+        etablissement = Etablissement.objects.create(
+            user=User.objects.create_user(username="vendeur", password="pass"),
+            nom="Boutique", contact_1="0102030405", adresse="Rue",
+            nom_du_responsable="Kouassi", prenoms_duresponsable="Awa", categorie=categorie,
+        )
+        produit = Produit.objects.create(
+            nom="Pizza", prix=1000, etablissement=etablissement,
+            categorie=CategorieProduit.objects.create(nom="Plats", description="d", categorie=categorie),
+        )
+        commande = Commande.objects.create(customer=customer, prix_total=2000, transaction_id="TX-RECU")
+        ProduitPanier.objects.create(
+            commande=commande, produit=produit, etablissement=etablissement, quantite=2, nom_produit="Pizza", prix_unitaire=1000,
+        )
+        indexer_commande(commande)
+        return commande
+
+    @pytest.fixture
+    def imprimer(self):
+        with patch('client.pdf.imprimer_pdf', return_value=b"%PDF-1.4") as mock_imprimer:
+            yield mock_imprimer
+
+    def test_reutilise_le_pdf(self, client, commande, imprimer):
+        client.force_login(commande.customer.user)
+        url = reverse("invoice_pdf", args=[commande.id])
+
+        premiere = client.get(url)
+        seconde = client.get(url)
+
+        assert imprimer.call_count == 1
+        assert b"".join(seconde.streaming_content) == b"%PDF-1.4"
+        assert premiere["ETag"] == seconde["ETag"]
+        assert client.get(url, HTTP_IF_NONE_MATCH=premiere["ETag"]).status_code == 304
+
+    def test_regenere_si_la_commande_change(self, client, commande, imprimer):
+        client.force_login(commande.customer.user)
+        url = reverse("invoice_pdf", args=[commande.id])
+        etag = client.get(url)["ETag"]
+
+        commande.produit_commande.update(quantite=3)
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        assert response.status_code == 200
+        assert response["ETag"] != etag
+        assert imprimer.call_count == 2
+        commande.refresh_from_db()
+        assert commande.recu_paiement.name.endswith(f"{response['ETag'].strip(chr(34))[:16]}.pdf")
+
+    def test_recu_prepare_par_la_file(self, client, commande, imprimer, django_capture_on_commit_callbacks):
+        from client.taches import metriques, mettre_en_file, traiter_file
+
+        with django_capture_on_commit_callbacks(execute=True):
+            mettre_en_file(commande)
+        client.force_login(commande.customer.user)
+        url = reverse("invoice_pdf", args=[commande.id])
+
+        assert client.get(url).status_code == 202
+        assert metriques()['file']['attente'] == 1
+        assert traiter_file() == 1
+        response = client.get(url)
+
+        assert response.status_code == 200
+        assert imprimer.call_count == 1
+        stats = metriques()
+        assert stats['file']['attente'] == 0 and stats['file']['terminee'] == 1
+        assert stats['latence_moyenne'] is not None
+
+    def test_tache_en_retard_imprimee_a_la_demande(self, client, commande, imprimer):
+        import datetime
+        from client.models import TacheRecu
+
+        tache = TacheRecu.objects.create(commande=commande)
+        TacheRecu.objects.filter(id=tache.id).update(date_add=tache.date_add - datetime.timedelta(minutes=5))
+        client.force_login(commande.customer.user)
+
+        response = client.get(reverse("invoice_pdf", args=[commande.id]))
+
+        assert response.status_code == 200
+        tache.refresh_from_db()
+        assert tache.etat == TacheRecu.TERMINEE
+
+    def test_tache_abandonnee_limitee_en_tentatives(self, commande, settings):
+        import datetime
+        from client.models import TacheRecu
+        from client.taches import DELAI_ABANDON, prendre_tache
+
+        # Worker mort pendant la génération : remise en attente tant qu'il reste des tentatives
+        settings.RECEIPT_MAX_ATTEMPTS = 2
+        tache = TacheRecu.objects.create(commande=commande)
+        for _ in range(2):
+            assert prendre_tache().id == tache.id
+            TacheRecu.objects.filter(id=tache.id).update(date_debut=timezone.now() - DELAI_ABANDON - datetime.timedelta(minutes=1))
+        tache.refresh_from_db()
+        assert (tache.etat, tache.tentatives) == (TacheRecu.EN_COURS, 2)
+
+        assert prendre_tache() is None
+        tache.refresh_from_db()
+        assert tache.etat == TacheRecu.ECHEC
+        assert tache.date_fin is not None
+
+    def test_export_zip_des_recus(self, client, commande, imprimer):
+        import io
+        import zipfile
+        from client.recus import generer_recu
+
+        generer_recu(commande)
+        autre = Commande.objects.create(customer=commande.customer, prix_total=1000, transaction_id="TX-RECU-2")
+        ligne = commande.produit_commande.get()
+        autre.produit_commande.create(
+            produit=ligne.produit, etablissement=ligne.etablissement, quantite=1, nom_produit="Pizza", prix_unitaire=1000,
+        )
+        indexer_commande(autre)
+        client.force_login(ligne.produit.etablissement.user)
+
+        response = client.get(reverse("export_recus"))
+        archive = zipfile.ZipFile(io.BytesIO(b"".join(response.streaming_content)))
+
+        assert sorted(archive.namelist()) == ["Recu_TX-RECU-2.pdf", "Recu_TX-RECU.pdf"]
+        assert archive.read("Recu_TX-RECU.pdf") == b"%PDF-1.4"
+        assert archive.read("Recu_TX-RECU-2.pdf").startswith(b"%PDF")
+        assert imprimer.call_count == 1
+
+
+class MoteursPDFTest(unittest.TestCase):
+    """Chaque moteur imprime le même reçu sans toucher à la base."""
+
+    def setUp(self):
+        from client.management.commands.bench_moteurs_pdf import commande_fictive
+        from client.recus import contexte_recu
+
+        self.contexte = contexte_recu(commande_fictive(3), "https://cooldeal.test/deals/commande-reçu-detail/0/", "")
+
+    def test_reportlab(self):
+        from client.pdf import ReportlabBackend
+
+        self.assertTrue(ReportlabBackend().rendre(self.contexte).startswith(b"%PDF"))
+
+    def test_xhtml2pdf(self):
+        from client.pdf import XHTML2PDFBackend
+
+        self.assertTrue(XHTML2PDFBackend().rendre(self.contexte).startswith(b"%PDF"))
+
+
+class QRCodeTest(unittest.TestCase):
+
+    def setUp(self):
+        from client.utils import qrcode_encode
+        qrcode_encode.cache_clear()
+
+    def test_png_memorise(self):
+        from client.utils import qrcode_base64, qrcode_encode
+
+        self.assertEqual(qrcode_base64("https://cooldeal.test/r/1/"), qrcode_base64("https://cooldeal.test/r/1/"))
+        self.assertEqual(qrcode_encode.cache_info().hits, 1)
+
+    def test_svg_sans_raster(self):
+        import base64
+        from client.utils import qrcode_svg
+
+        svg = base64.b64decode(qrcode_svg("https://cooldeal.test/r/1/")).decode("utf-8")
+        self.assertTrue(svg.startswith("<svg"))
+        self.assertIn('<path d="M', svg)
+
+    def test_lot_deduplique(self):
+        from client.utils import qrcode_encode, qrcodes
+
+        codes = qrcodes(["https://cooldeal.test/r/1/", "https://cooldeal.test/r/2/", "https://cooldeal.test/r/1/"])
+        self.assertEqual(list(codes), ["https://cooldeal.test/r/1/", "https://cooldeal.test/r/2/"])
+        self.assertEqual(qrcode_encode.cache_info().misses, 2)
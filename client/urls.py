@@ -9,5 +9,6 @@ urlpatterns = [
     path('liste-souhait', views.souhait, name="liste-souhait"),
     path('parametre', views.parametre, name="parametre"),
     path('receipt/<int:order_id>/', views.invoice_pdf, name="invoice_pdf"),
+    path('receipt/metriques', views.metriques_recus, name="metriques_recus"),
 
 ]
@@ -1,24 +1,113 @@
+import datetime
 from io import BytesIO
 from django.http import HttpResponse
 from django.template.loader import get_template
+from django.utils import timezone
 
 from xhtml2pdf import pisa
 import qrcode, base64
-from io import BytesIO
+from functools import lru_cache
 
 
 def render_to_pdf(template_src, context_dict={}):
     template = get_template(template_src)
     html = template.render(context_dict)
+    pdf = html_vers_pdf(html)
+    if pdf is not None:
+        return HttpResponse(pdf, content_type='application/pdf')
+    return None
+
+
+def html_vers_pdf(html):
+    """HTML vers PDF avec xhtml2pdf ; n'utilise pas Django, appelable dans un processus fils."""
     result = BytesIO()
     pdf = pisa.pisaDocument(BytesIO(html.encode("utf-8")), result)
     if not pdf.err:
-        return HttpResponse(result.getvalue(), content_type='application/pdf')
+        return result.getvalue()
     return None
 
 
-def qrcode_base64(data: str) -> str:
-    img = qrcode.make(data)
+# Niveaux de correction d'erreur acceptés par qrcode_encode
+NIVEAUX_CORRECTION = {
+    "L": qrcode.constants.ERROR_CORRECT_L,
+    "M": qrcode.constants.ERROR_CORRECT_M,
+    "Q": qrcode.constants.ERROR_CORRECT_Q,
+    "H": qrcode.constants.ERROR_CORRECT_H,
+}
+
+
+@lru_cache(maxsize=1024)
+def qrcode_encode(data: str, format: str = "png", box_size: int = 10, border: int = 4, correction: str = "M") -> str:
+    """QR code encodé en base64, mémorisé par contenu et options.
+
+    format="svg" produit un SVG vectoriel sans passer par PIL ; "png"
+    garde le rendu historique de qrcode.make().
+    """
+    qr = qrcode.QRCode(error_correction=NIVEAUX_CORRECTION[correction], box_size=box_size, border=border)
+    qr.add_data(data)
+    if format == "svg":
+        return base64.b64encode(_svg(qr.get_matrix()).encode("utf-8")).decode("utf-8")
     buf = BytesIO()
-    img.save(buf, format="PNG")
-    return base64.b64encode(buf.getvalue()).decode("utf-8")
\ No newline at end of file
+    qr.make_image().save(buf, format="PNG")
+    return base64.b64encode(buf.getvalue()).decode("utf-8")
+
+
+def _svg(matrice):
+    # Un seul <path>, un rectangle par suite de modules noirs d'une même rangée
+    taille = len(matrice)
+    segments = []
+    for y, rangee in enumerate(matrice):
+        x = 0
+        while x < taille:
+            if rangee[x]:
+                debut = x
+                while x < taille and rangee[x]:
+                    x += 1
+                segments.append(f"M{debut} {y}h{x - debut}v1h-{x - debut}z")
+            else:
+                x += 1
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {taille} {taille}" shape-rendering="crispEdges">'
+        f'<path d="{"".join(segments)}"/></svg>'
+    )
+
+
+def qrcode_base64(data: str) -> str:
+    return qrcode_encode(data)
+
+
+def qrcode_svg(data: str) -> str:
+    return qrcode_encode(data, format="svg")
+
+
+def qrcodes(datas, **options):
+    """Génération en lot (exports) : chaque contenu distinct n'est encodé qu'une fois."""
+    return {data: qrcode_encode(data, **options) for data in dict.fromkeys(datas)}
+
+# Saisies de date reconnues dans la recherche des commandes, du jour à l'année
+FORMATS_PERIODE = (
+    ("%d/%m/%Y", "jour"), ("%d-%m-%Y", "jour"), ("%Y-%m-%d", "jour"),
+    ("%m/%Y", "mois"), ("%m-%Y", "mois"), ("%Y-%m", "mois"),
+    ("%Y", "annee"),
+)
+
+
+def periode(texte):
+    """(début, fin) de la journée, du mois ou de l'année saisis, fin exclue ; None si ce n'est pas une date."""
+    for format, unite in FORMATS_PERIODE:
+        try:
+            debut = datetime.datetime.strptime(texte.strip(), format)
+        except ValueError:
+            continue
+        try:
+            if unite == "jour":
+                fin = debut + datetime.timedelta(days=1)
+            elif unite == "mois":
+                fin = (debut + datetime.timedelta(days=31)).replace(day=1)
+            else:
+                fin = debut.replace(year=debut.year + 1)
+            return timezone.make_aware(debut), timezone.make_aware(fin)
+        except (ValueError, OverflowError):
+            # Fin après l'an 9999 (« 9999 », fragment d'un identifiant de transaction) : pas une date
+            return None
+    return None
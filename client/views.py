@@ -4,19 +4,31 @@ from django.contrib.auth.models import User
 from customer.models import Customer, Commande, ProduitPanier
 from shop.models import  Favorite, Produit
 from django.core.paginator import Paginator
-from django.db.models import Q
+from django.db.models import Prefetch, Q
 from cities_light.models import City
 from django.template.loader import render_to_string
-from django.http import HttpResponse
+from django.http import FileResponse, HttpResponse, JsonResponse
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.utils import timezone
+from datetime import timedelta
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
 from .utils import render_to_pdf
-from .utils import qrcode_base64
+from .utils import periode, qrcode_base64
 from website.models import SiteInfo
+import logging
 import qrcode
-from playwright.sync_api import sync_playwright
+from .navigateur import PoolSature
+from .recus import empreinte, imprimer_recu, recu_enregistre, sources_recu
+from .taches import metriques, tache_en_attente, terminer
 import base64
 from io import BytesIO
 
 
+logger = logging.getLogger(__name__)
+
+
 # Create your views here.
 
 
@@ -50,31 +62,31 @@ def commande(request):
     except:
         return redirect('index')
 
-    # Récupération de toutes les commandes de l'utilisateur
-    commandes = Commande.objects.filter(customer=customer).order_by('-date_add')
+    # Récupération de toutes les commandes de l'utilisateur, lignes chargées en une requête par page
+    commandes = Commande.objects.filter(customer=customer).order_by('-date_add').prefetch_related(
+        Prefetch('produit_commande', to_attr='lignes')
+    )
 
-    # Recherche par ID transaction, produit ou date
+    # Recherche par ID transaction, produit ou date (jour, mois ou année : intervalle indexable)
     query = request.GET.get('q')
     if query:
-        commandes = commandes.filter(
-            Q(transaction_id__icontains=query) |
-            Q(date_add__icontains=query) |
-            Q(produit_commande__produit__nom__icontains=query)
-        ).distinct()
+        recherche = Q(transaction_id__icontains=query) | Q(
+            id__in=ProduitPanier.objects.filter(nom_produit__icontains=query).values('commande_id')
+        )
+        dates = periode(query)
+        if dates is not None:
+            recherche |= Q(date_add__gte=dates[0], date_add__lt=dates[1])
+        commandes = commandes.filter(recherche)
 
     # Pagination : Limite à 10 articles par page
     paginator = Paginator(commandes, 10)  # 10 commandes par page
     page = request.GET.get('page')
     commandes_paginated = paginator.get_page(page)
 
-    # Récupération des produits associés aux commandes paginées
-    commandes_data = []
-    for commande in commandes_paginated:
-        produits_commande = ProduitPanier.objects.filter(commande=commande).select_related('produit')
-        commandes_data.append({
-            'commande': commande,
-            'produits': produits_commande,
-        })
+    commandes_data = [
+        {'commande': commande, 'produits': commande.lignes}
+        for commande in commandes_paginated
+    ]
 
     datas = {
         'user': user,
@@ -209,45 +221,63 @@ def parametre(request):
     return render(request, 'parametre.html', datas)
 
 
+def recu_indisponible(message):
+    response = HttpResponse(message, status=503)
+    response["Retry-After"] = "5"
+    return response
+
+
 @login_required
 def invoice_pdf(request, order_id):
     order = get_object_or_404(Commande, id=order_id)
     if not hasattr(request.user, "customer") or order.customer_id != request.user.customer.id:
         return redirect("commande")
 
-    # 1. Générer le QR code en base64
-
-    detail_url = request.build_absolute_uri(
-        reverse("commande-reçu-detail", args=[order.id])  # ou une URL publique de vérif
-    )
-    qr_b64 = qrcode_base64(detail_url)
-
-    # 2. Construire le HTML à partir du template
-    html = render_to_string("receipt.html", {
-        "order_id": order,
-        "produits_commande": order.produit_commande.all(),
-        "qr_code": qr_b64,
-        "logo": request.build_absolute_uri(SiteInfo.objects.latest('date_add').logo.url)
-    }, request=request)
-
-    # 3. Lancer Playwright et générer le PDF
-    with sync_playwright() as p:
-        browser = p.chromium.launch()
-        page = browser.new_page()
-        page.set_content(html, wait_until="load")  # on imprime directement le HTML rendu
-        pdf_bytes = page.pdf(
-            format="A4",
-            print_background=True,
-            margin={"top": "10mm", "right": "10mm", "bottom": "10mm", "left": "10mm"}
-        )
-        browser.close()
+    # 1. Le reçu ne change que si la commande, le QR code ou le logo changent
+    detail_url, logo = sources_recu(order)
+    cle = empreinte(order, detail_url, logo)
+    response = get_conditional_response(request, etag=quote_etag(cle))
+    if response is not None:
+        return response
+
+    fichier = recu_enregistre(order, cle)
+    if fichier is None:
+        # 2. Normalement déjà imprimé par `manage.py traiter_recus` après la commande
+        tache = tache_en_attente(order)
+        delai = timedelta(seconds=getattr(settings, "RECEIPT_PENDING_TIMEOUT", 30))
+        if tache is not None and timezone.now() - tache.date_add < delai:
+            response = HttpResponse("Votre reçu est en cours de préparation, il sera téléchargé dans un instant.", status=202)
+            response["Retry-After"] = "3"
+            response["Refresh"] = "3"
+            return response
+
+        # 3. Pas de worker, tâche en retard ou en échec : impression à la demande
+        try:
+            fichier = imprimer_recu(order, detail_url, logo, cle)
+        except PoolSature:
+            return recu_indisponible("Trop de reçus en cours de génération, réessayez dans un instant.")
+        except TimeoutError:
+            logger.warning("Impression du reçu de la commande %s trop longue", order.id)
+            return recu_indisponible("La génération du reçu a pris trop de temps, réessayez dans un instant.")
+        except Exception:
+            # Chromium planté ou déconnecté : le pool le relance à l'impression suivante
+            logger.exception("Impression du reçu de la commande %s", order.id)
+            return recu_indisponible("Le reçu n'a pas pu être généré, réessayez dans un instant.")
+        terminer(order)
 
     # 4. Forcer le téléchargement du PDF
     filename = f"Recu_{order.transaction_id}.pdf"
-    response = HttpResponse(pdf_bytes, content_type="application/pdf")
-    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    response = FileResponse(fichier.open("rb"), as_attachment=True, filename=filename, content_type="application/pdf")
+    response["ETag"] = quote_etag(cle)
+    response["Cache-Control"] = "private, no-cache"
     return response
 
+
+@staff_member_required
+def metriques_recus(request):
+    """Profondeur de la file des reçus et latences de génération (secondes)."""
+    return JsonResponse(metriques())
+
 #
 # @login_required
 # def invoice_pdf(request, order_id):
@@ -0,0 +1,17 @@
+import pytest
+from django.core.cache import cache
+
+
+@pytest.fixture(autouse=True)
+def vider_cache():
+    # Le cache local survit aux rollbacks des tests : on repart d'un cache vide
+    cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def statiques_sans_manifeste(settings):
+    # Le manifeste n'existe qu'après collectstatic : les tests servent les statiques par leur nom
+    settings.STORAGES = {
+        **settings.STORAGES,
+        "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+    }
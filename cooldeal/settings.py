@@ -93,12 +93,26 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedStaticFilesStorage'
+STORAGES = {
+    # Médias nommés par l'empreinte de leur contenu : dédoublonnés, URL immuables
+    "default": {"BACKEND": "website.stockage.StockageContenu"},
+    "recus": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    # Noms empreintés, gzip + Brotli, thème élagué à collectstatic (website.statiques)
+    "staticfiles": {"BACKEND": "website.statiques.StockageStatiques"},
+}
+# Seules les copies empreintées, servies avec Cache-Control immutable, restent dans STATIC_ROOT
+WHITENOISE_KEEP_ONLY_HASHED_FILES = True
 
 CRON_CLASSES = [
     "customer.cron.CleanExpiredTokensCronJob",
 ]
 
+# Tâches planifiées par django_crontab (`manage.py crontab add`)
+CRONJOBS = [
+    # Médias orphelins : chaque nuit à 3 h
+    ('0 3 * * *', 'django.core.management.call_command', ['nettoyer_medias']),
+]
+
 
 REST_FRAMEWORK = {
     # Use Django's standard `django.contrib.auth` permissions,
@@ -127,7 +141,6 @@ TEMPLATES = [
                 'django.contrib.messages.context_processors.messages',
                 'website.context_processors.categories',
                 'website.context_processors.site_infos',
-                'website.context_processors.cities',
                 'website.context_processors.cart',
                 'website.context_processors.galeries',
                 'website.context_processors.horaires',
@@ -160,6 +173,22 @@ DATABASES = {
 # }
 
 
+# Cache
+# Mémoire locale par défaut ; avec plusieurs workers, utiliser un cache partagé, par ex.
+# CACHE_BACKEND=django.core.cache.backends.redis.RedisCache CACHE_LOCATION=redis://127.0.0.1:6379
+# ou CACHE_BACKEND=django.core.cache.backends.filebased.FileBasedCache CACHE_LOCATION=/var/tmp/cooldeal
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'cooldeal'),
+    }
+}
+
+# Durée maximale (secondes) des données communes du site (catégories, infos, galerie, horaires)
+SITE_CACHE_TIMEOUT = 300
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -202,6 +231,7 @@ STATICFILES_DIRS = [
 ]
 STATIC_ROOT =  BASE_DIR /  'staticfiles'
 
+# Servis en production par le serveur web, Cache-Control immutable compris : deploy/nginx.conf
 MEDIA_URL = '/media/'
 
 MEDIA_ROOT = BASE_DIR / "media"
@@ -218,6 +248,42 @@ SILENCED_SYSTEM_CHECKS = ["security.W019"]
 
 LOGIN_URL = 'login'
 
+# Pagination du catalogue /deals/
+SHOP_PAGE_SIZE = 12
+SHOP_MAX_PAGE_SIZE = 48
+
+# Boîte de commandes des vendeurs : commandes par page, durée (s) du cache des totaux filtrés
+SHOP_INBOX_PAGE_SIZE = 25
+SHOP_INBOX_COUNT_TIMEOUT = 300
+
+# Moteur de recherche des produits (FTS5 par défaut sous SQLite)
+# SHOP_SEARCH_BACKEND = 'shop.search.FTS5SearchBackend'
+
+# Impression des reçus PDF : onglets Chromium par processus, file d'attente max, délai (s)
+RECEIPT_PDF_POOL_SIZE = 2
+RECEIPT_PDF_QUEUE_MAX = 16
+RECEIPT_PDF_TIMEOUT = 30
+# Moteur : client.pdf.PlaywrightBackend, client.pdf.XHTML2PDFBackend ou client.pdf.ReportlabBackend
+RECEIPT_PDF_BACKEND = 'client.pdf.PlaywrightBackend'
+
+# Adresse publique du site, utilisée pour les liens des reçus générés hors requête
+SITE_URL = os.environ.get('SITE_URL', 'https://www.cooldeal-ci.com')
+
+# File des reçus : essais avant échec, et délai (s) au-delà duquel invoice_pdf imprime lui-même
+RECEIPT_MAX_ATTEMPTS = 3
+RECEIPT_PENDING_TIMEOUT = 30
+
+# Export des reçus en ZIP : commandes max par archive, processus de conversion (défaut : nb de CPU)
+RECEIPT_EXPORT_MAX = 500
+RECEIPT_EXPORT_WORKERS = None
+
+# Images téléversées : au-delà de ce poids (octets) le fichier est écrit sur disque pendant la réception
+FILE_UPLOAD_MAX_MEMORY_SIZE = 512 * 1024
+# Worker `traiter_images` : processus (défaut : nb de CPU), plus grand côté des originaux (px), essais max
+IMAGE_WORKERS = None
+IMAGE_MAX_DIMENSION = 2400
+IMAGE_MAX_ATTEMPTS = 3
+
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = 'smtp.gmail.com'
 EMAIL_PORT = 587
@@ -1,4 +1,7 @@
 from django.contrib import admin
+from django.http import StreamingHttpResponse
+
+from client.export import recus_zip
 
 import customer.models as models
 from .models import PasswordResetToken  
@@ -114,6 +117,14 @@ class CommandeAdmin(admin.ModelAdmin):
         'prix_total',
         'recu_paiement',
     )
+    actions = ['exporter_recus']
+
+    @admin.action(description="Exporter les reçus sélectionnés (ZIP)")
+    def exporter_recus(self, request, queryset):
+        commandes = queryset.order_by('-date_add').prefetch_related('produit_commande')
+        response = StreamingHttpResponse(recus_zip(commandes.iterator(chunk_size=100)), content_type="application/zip")
+        response["Content-Disposition"] = 'attachment; filename="recus.zip"'
+        return response
 
 
 class ProduitPanierAdmin(admin.ModelAdmin):
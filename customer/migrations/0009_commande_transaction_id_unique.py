@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customer', '0008_customer_ville'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='commande',
+            name='transaction_id',
+            field=models.CharField(max_length=250, null=True, unique=True),
+        ),
+    ]
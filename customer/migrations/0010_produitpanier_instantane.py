@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:30
+
+import datetime
+
+from django.db import migrations, models
+
+
+def remplir_instantanes(apps, schema_editor):
+    # Les commandes existantes n'ont pas gardé le prix payé : on fige le prix actuel
+    ProduitPanier = apps.get_model('customer', 'ProduitPanier')
+    today = datetime.date.today()
+    lignes = ProduitPanier.objects.filter(commande__isnull=False).select_related('produit')
+    a_jour = []
+    for ligne in lignes.iterator(chunk_size=500):
+        produit = ligne.produit
+        promo = bool(
+            produit.date_debut_promo and produit.date_fin_promo
+            and produit.date_debut_promo <= today <= produit.date_fin_promo
+        )
+        ligne.nom_produit = produit.nom
+        ligne.prix_unitaire = produit.prix_promotionnel if promo else produit.prix
+        ligne.en_promotion = promo
+        ligne.image_produit = produit.image.name
+        a_jour.append(ligne)
+    ProduitPanier.objects.bulk_update(
+        a_jour, ['nom_produit', 'prix_unitaire', 'en_promotion', 'image_produit'], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customer', '0009_commande_transaction_id_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='produitpanier',
+            name='en_promotion',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='produitpanier',
+            name='image_produit',
+            field=models.ImageField(blank=True, null=True, upload_to='produis/images'),
+        ),
+        migrations.AddField(
+            model_name='produitpanier',
+            name='nom_produit',
+            field=models.CharField(blank=True, max_length=254, null=True),
+        ),
+        migrations.AddField(
+            model_name='produitpanier',
+            name='prix_unitaire',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.RunPython(remplir_instantanes, migrations.RunPython.noop),
+    ]
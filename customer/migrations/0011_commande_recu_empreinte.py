@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customer', '0010_produitpanier_instantane'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='commande',
+            name='recu_empreinte',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def remplir_etablissement(apps, schema_editor):
+    ProduitPanier = apps.get_model('customer', 'ProduitPanier')
+    Produit = apps.get_model('shop', 'Produit')
+    ProduitPanier.objects.filter(commande__isnull=False, etablissement__isnull=True).update(
+        etablissement=Subquery(Produit.objects.filter(id=OuterRef('produit_id')).values('etablissement')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customer', '0011_commande_recu_empreinte'),
+        ('shop', '0022_ventesproduitjour'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='produitpanier',
+            name='etablissement',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='lignes_commande', to='shop.etablissement'),
+        ),
+        migrations.AddIndex(
+            model_name='produitpanier',
+            index=models.Index(fields=['etablissement', 'commande'], name='ligne_etablissement_idx'),
+        ),
+        migrations.RunPython(remplir_etablissement, migrations.RunPython.noop),
+    ]
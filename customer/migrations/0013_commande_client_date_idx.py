@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customer', '0012_produitpanier_etablissement'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='commande',
+            index=models.Index(fields=['customer', '-date_add'], name='commande_client_date_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:33
+
+import customer.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customer', '0013_commande_client_date_idx'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='commande',
+            name='recu_paiement',
+            field=models.FileField(null=True, storage=customer.models.stockage_recus, upload_to='fichiers/paiements'),
+        ),
+    ]
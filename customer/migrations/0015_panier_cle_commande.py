@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:31
+
+import uuid
+from django.db import migrations, models
+
+
+def remplir_cles(apps, schema_editor):
+    # Le défaut de AddField donne la même clé à tous les paniers existants
+    Panier = apps.get_model('customer', 'Panier')
+    for panier_id in Panier.objects.values_list('id', flat=True):
+        Panier.objects.filter(id=panier_id).update(cle_commande=uuid.uuid4())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customer', '0014_recu_paiement_stockage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='panier',
+            name='cle_commande',
+            field=models.UUIDField(default=uuid.uuid4, editable=False),
+        ),
+        migrations.RunPython(remplir_cles, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='commande',
+            name='transaction_id',
+            field=models.CharField(max_length=250, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='commande',
+            constraint=models.UniqueConstraint(fields=('customer', 'transaction_id'), name='commande_client_transaction_unique'),
+        ),
+    ]
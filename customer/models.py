@@ -1,11 +1,21 @@
+import uuid
+
+from django.core.files.storage import storages
 from django.db import models
 from django.contrib.auth.models import User
 from django.contrib.sessions.models import Session
 from cinetpay_sdk.s_d_k import Cinetpay
 from shop import models as Produit
+from shop.models import prix_effectif
 from django.utils.timezone import now
 from datetime import timedelta
 from cities_light.models import City
+from django.utils.functional import cached_property
+
+
+def stockage_recus():
+    # Un reçu par commande, à son nom : hors du stockage par empreinte (website.stockage)
+    return storages["recus"]
 
 
 # Create your models here.
@@ -73,6 +83,8 @@ class Panier(models.Model):
     customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name="user_panier", null=True , blank=True)
     date_add = models.DateTimeField(auto_now_add=True)
     coupon = models.ForeignKey(CodePromotionnel, on_delete=models.CASCADE, related_name="code_use", null=True , blank=True)
+    # Clé d'idempotence de la validation, rendue dans la page de paiement : la même à chaque nouvel essai
+    cle_commande = models.UUIDField(default=uuid.uuid4, editable=False)
     date_update = models.DateTimeField(auto_now=True)
     status = models.BooleanField(default=True)
 
@@ -85,28 +97,42 @@ class Panier(models.Model):
         """Unicode representation of Panier."""
         return "panier"
 
+    @cached_property
+    def totaux(self):
+        """Sous-total, réduction et total du panier calculés en une seule requête."""
+        prix_ligne = models.ExpressionWrapper(
+            prix_effectif('produit__') * models.F('quantite'),
+            output_field=models.FloatField(),
+        )
+        agg = self.produit_panier.aggregate(
+            sous_total=models.Sum(prix_ligne),
+            taux=models.Max('panier__coupon__reduction'),
+            lignes=models.Count('id'),
+        )
+        sous_total = agg['sous_total'] or 0
+        reduction = (agg['taux'] or 0) * sous_total
+        return {
+            'sous_total': int(sous_total),
+            'reduction': reduction,
+            'total': int(sous_total - reduction),
+            'lignes': agg['lignes'],
+        }
+
+    @cached_property
+    def lignes(self):
+        return list(self.produit_panier.select_related('produit'))
+
     @property
     def total(self):
-        panier = Panier.objects.get(id=self.id)
-        sum = 0
-        for i in panier.produit_panier.all():
-            sum = sum + i.total
-        return int(sum)
+        return self.totaux['sous_total']
 
     @property
     def total_with_coupon(self):
-        reduction = 0
-        if self.coupon:
-            reduction = self.coupon.reduction * self.total
-        return int(self.total - reduction)
+        return self.totaux['total']
 
     @property
     def check_empty(self):
-        panier = Panier.objects.get(id=self.id)
-        if panier.produit_panier.count() > 0:
-            return True
-        else:
-            return False
+        return self.totaux['lignes'] > 0
 
 
 class Commande(models.Model):
@@ -117,20 +143,29 @@ class Commande(models.Model):
     id_paiment = models.CharField( max_length=50, null=True)
     payment_token = models.CharField(max_length=250, null=True)
     payment_url = models.TextField(null=True)
-    transaction_id = models.TextField(null=True)
+    transaction_id = models.CharField(max_length=250, null=True)
     api_response_id = models.CharField(max_length=50, null=True)
     crypto = models.CharField(max_length=50, null=True)
     prix_total = models.FloatField()
     date_add = models.DateTimeField(auto_now_add=True)
     date_update = models.DateTimeField(auto_now=True)
     status = models.BooleanField(default=True)
-    recu_paiement = models.FileField(upload_to="fichiers/paiements", null=True)
+    recu_paiement = models.FileField(upload_to="fichiers/paiements", storage=stockage_recus, null=True)
+    recu_empreinte = models.CharField(max_length=64, null=True, blank=True)
 
     class Meta:
         """Meta definition for UserRessource."""
 
         verbose_name = 'Commande'
         verbose_name_plural = 'Commandes'
+        indexes = [
+            # Historique d'un client, du plus récent au plus ancien, filtrable par période
+            models.Index(fields=['customer', '-date_add'], name='commande_client_date_idx'),
+        ]
+        constraints = [
+            # Idempotence de passer_commande : une clé ne désigne qu'une commande par client
+            models.UniqueConstraint(fields=['customer', 'transaction_id'], name='commande_client_transaction_unique'),
+        ]
 
     def __str__(self):
         """Unicode representation of UserRessource."""
@@ -150,6 +185,13 @@ class ProduitPanier(models.Model):
     panier = models.ForeignKey(Panier, related_name="produit_panier", on_delete=models.CASCADE, null=True)
     commande = models.ForeignKey(Commande, related_name="produit_commande", on_delete=models.CASCADE, null=True)
     quantite = models.IntegerField(default=1)
+    # Instantané du produit figé au passage de la commande
+    nom_produit = models.CharField(max_length=254, null=True, blank=True)
+    prix_unitaire = models.FloatField(null=True, blank=True)
+    en_promotion = models.BooleanField(default=False)
+    image_produit = models.ImageField(upload_to='produis/images', null=True, blank=True)
+    # Vendeur de la ligne, recopié du produit : les commandes d'un établissement sans jointure
+    etablissement = models.ForeignKey('shop.Etablissement', related_name="lignes_commande", on_delete=models.CASCADE, null=True, blank=True, db_index=False)
     date_add = models.DateTimeField(auto_now_add=True)
     date_update = models.DateTimeField(auto_now=True)
     status = models.BooleanField(default=True)
@@ -159,9 +201,15 @@ class ProduitPanier(models.Model):
 
         verbose_name = 'Produit Panier/Commande'
         verbose_name_plural = 'Produits Panier/Commande'
+        indexes = [
+            models.Index(fields=['etablissement', 'commande'], name='ligne_etablissement_idx'),
+        ]
 
     @property
     def total(self):
+        if self.prix_unitaire is not None:
+            # Ligne de commande : le prix payé, pas le prix actuel du catalogue
+            return self.prix_unitaire * self.quantite
         if self.produit.check_promotion:
             return self.produit.prix_promotionnel * self.quantite
         else:
@@ -1,8 +1,11 @@
 import json
+import datetime
 import pytest
 import unittest
 from shop.models import Produit, Etablissement, CategorieEtablissement, CategorieProduit
 from customer import views
+from customer.models import CodePromotionnel, Commande, Customer, Panier, ProduitPanier
+from customer.utils import passer_commande
 from django.urls import reverse
 from django.test import TestCase
 from django.http import JsonResponse
@@ -584,4 +587,111 @@ class TestFonctionnel:
 
         # Vérifier que l'utilisateur est maintenant déconnecté
         session = client_logged.session
-        assert '_auth_user_id' not in session
\ No newline at end of file
+        assert '_auth_user_id' not in session
+
+@pytest.mark.django_db
+class TestTotauxPanier:
+    """Les totaux du panier sont calculés en SQL, en une seule requête."""
+
+    @pytest.fixture
+    def panier(self, produit, etablissement, categorie_produit):
+        today = datetime.date.today()
+        promo = Produit.objects.create(
+            nom="Produit Promo",
+            description="Produit en promotion",
+            description_deal="Deal",
+            prix=2000,
+            prix_promotionnel=1500,
+            date_debut_promo=today - datetime.timedelta(days=1),
+            date_fin_promo=today + datetime.timedelta(days=1),
+            etablissement=etablissement,
+            categorie=categorie_produit,
+        )
+        coupon = CodePromotionnel.objects.create(
+            libelle="Dix pourcent", etat=True, date_fin=today, reduction=0.1, code_promo="DIX"
+        )
+        panier = Panier.objects.create(coupon=coupon)
+        ProduitPanier.objects.create(panier=panier, produit=produit, quantite=2)
+        ProduitPanier.objects.create(panier=panier, produit=promo, quantite=1)
+        return Panier.objects.get(id=panier.id)
+
+    def test_totaux_une_seule_requete(self, panier, django_assert_num_queries):
+        with django_assert_num_queries(1):
+            assert panier.total == 3500
+            assert panier.total_with_coupon == 3150
+            assert panier.check_empty
+
+    def test_panier_vide(self, db):
+        panier = Panier.objects.create()
+        assert panier.total == 0
+        assert panier.total_with_coupon == 0
+        assert not panier.check_empty
+
+
+@pytest.mark.django_db
+class TestPasserCommande:
+    """La validation du panier est atomique et idempotente sur transaction_id."""
+
+    @pytest.fixture
+    def customer(self, user):
+        return Customer.objects.create(user=user, adresse="Rue test", contact_1="0000000000")
+
+    @pytest.fixture
+    def panier(self, customer, produit):
+        panier = Panier.objects.create(customer=customer)
+        ProduitPanier.objects.create(panier=panier, produit=produit, quantite=3)
+        return panier
+
+    def test_commande_creee(self, customer, panier, produit):
+        commande, creee = passer_commande(panier.id, customer, "TX-1")
+
+        assert creee
+        assert commande.prix_total == 3000
+        assert list(commande.produit_commande.values_list('produit_id', 'quantite')) == [(produit.id, 3)]
+        assert not Panier.objects.filter(id=panier.id).exists()
+
+    def test_double_envoi(self, customer, panier):
+        commande, _ = passer_commande(panier.id, customer, "TX-1")
+        doublon, creee = passer_commande(panier.id, customer, "TX-1")
+
+        assert not creee
+        assert doublon == commande
+        assert Commande.objects.count() == 1
+
+    def test_nouvel_essai_apres_reponse_perdue(self, customer, panier):
+        # Panier déjà supprimé : la clé du panier, renvoyée telle quelle, retrouve la commande
+        cle = str(panier.cle_commande)
+        commande, _ = passer_commande(panier.id, customer, cle)
+        assert passer_commande(panier.id, customer, cle) == (commande, False)
+
+    def test_meme_cle_pour_deux_clients(self, customer, panier, produit):
+        autre = Customer.objects.create(
+            user=User.objects.create_user(username="autre", password="password123"), adresse="Rue", contact_1="0102030405",
+        )
+        panier_autre = Panier.objects.create(customer=autre)
+        ProduitPanier.objects.create(panier=panier_autre, produit=produit, quantite=1)
+
+        assert passer_commande(panier.id, customer, "TX-1")[1]
+        commande, creee = passer_commande(panier_autre.id, autre, "TX-1")
+        assert creee and commande.customer == autre
+        assert Panier.objects.create().cle_commande != panier.cle_commande
+
+    def test_panier_vide_ou_etranger(self, customer, user):
+        assert passer_commande(Panier.objects.create(customer=customer).id, customer, "TX-2") == (None, False)
+        assert passer_commande(Panier.objects.create().id, customer, "TX-3") == (None, False)
+        assert Commande.objects.count() == 0
+
+    def test_lignes_figees(self, customer, panier, produit):
+        produit.date_debut_promo = datetime.date.today()
+        produit.date_fin_promo = datetime.date.today()
+        produit.save()
+        commande, _ = passer_commande(panier.id, customer, "TX-4")
+
+        # Le catalogue change après la commande : la ligne garde le prix payé
+        Produit.objects.filter(id=produit.id).update(nom="Renommé", prix=5000, date_fin_promo=None)
+        ligne = commande.produit_commande.get()
+
+        assert (ligne.nom_produit, ligne.prix_unitaire, ligne.en_promotion) == ("Produit Test", 800, True)
+        assert ligne.image_produit.name == produit.image.name
+        assert ligne.etablissement_id == produit.etablissement_id
+        assert ligne.total == 2400
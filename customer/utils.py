@@ -0,0 +1,93 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, OuterRef, Subquery
+
+from shop.models import Produit, prix_effectif, promotion_en_cours
+from shop.commandes import indexer_commande
+from shop.statistiques import enregistrer_commande
+from website.stockage import ajouter_references
+
+from . import models
+
+
+PANIER_SESSION_KEY = 'panier_id'
+
+
+def get_panier(request):
+    """Retourne le panier de la session courante, créé une seule fois par session."""
+    session = getattr(request, 'session', None)
+    if session is None:
+        return None
+
+    panier = None
+    panier_id = session.get(PANIER_SESSION_KEY)
+    if panier_id is not None:
+        panier = models.Panier.objects.filter(id=panier_id).first()
+
+    if panier is None:
+        if session.session_key is None:
+            session.save()
+        panier = models.Panier(session_id_id=session.session_key)
+        if request.user.is_authenticated:
+            panier.customer = models.Customer.objects.filter(user=request.user).first()
+        panier.save()
+        session[PANIER_SESSION_KEY] = panier.id
+    elif request.user.is_authenticated and panier.customer_id is None:
+        # Le panier anonyme est rattaché au client après connexion
+        customer = models.Customer.objects.filter(user=request.user).first()
+        if customer is not None:
+            panier.customer = customer
+            panier.save(update_fields=['customer', 'date_update'])
+
+    return panier
+
+
+def instantane_produit():
+    """Expressions qui recopient nom, prix appliqué, promotion, image et établissement du produit sur la ligne."""
+    produit = Produit.objects.filter(id=OuterRef('produit_id'))
+    return {
+        'nom_produit': Subquery(produit.values('nom')[:1]),
+        'prix_unitaire': Subquery(produit.annotate(prix_applique=prix_effectif()).values('prix_applique')[:1]),
+        'en_promotion': Exists(produit.filter(promotion_en_cours())),
+        'image_produit': Subquery(produit.values('image')[:1]),
+        'etablissement': Subquery(produit.values('etablissement')[:1]),
+    }
+
+
+def passer_commande(panier_id, customer, transaction_id):
+    """Transforme le panier en commande en une seule transaction.
+
+    Retourne (commande, créée). Un nouvel envoi avec le même transaction_id
+    renvoie la commande déjà créée au lieu d'en créer une seconde.
+    """
+    try:
+        with transaction.atomic():
+            # Verrou sur le panier : un double envoi attend la fin du premier
+            panier = models.Panier.objects.select_for_update().filter(id=panier_id, customer=customer).first()
+            commande = models.Commande.objects.filter(transaction_id=transaction_id, customer=customer).first()
+            if commande is not None:
+                return commande, False
+            if panier is None or not panier.check_empty:
+                return None, False
+
+            commande = models.Commande.objects.create(
+                customer=customer,
+                payment_url='payment_url',
+                id_paiment=transaction_id,
+                transaction_id=transaction_id,
+                api_response_id='api_response_id',
+                payment_token='payment_token',
+                prix_total=panier.total_with_coupon,
+            )
+            # Les lignes gardent le prix payé même si le catalogue change ensuite
+            models.ProduitPanier.objects.filter(panier=panier).update(
+                panier=None, commande=commande, **instantane_produit()
+            )
+            # L'image recopiée sur la ligne compte comme une référence au fichier
+            ajouter_references(commande.produit_commande.values_list('image_produit', flat=True))
+            enregistrer_commande(commande)
+            indexer_commande(commande)
+            panier.delete()
+    except IntegrityError:
+        # Envoi concurrent avec le même transaction_id : la commande existe déjà
+        return models.Commande.objects.filter(transaction_id=transaction_id, customer=customer).first(), False
+    return commande, True
@@ -0,0 +1,104 @@
+import datetime
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import CommandeEtablissement, StatistiquesEtablissement
+from .search import normaliser
+
+
+def texte(valeur):
+    """Texte comparable : minuscules, sans accents ni ponctuation."""
+    return ' '.join(normaliser(valeur))
+
+
+def indexer_commande(commande):
+    """Crée les entrées de boîte de commandes de chaque vendeur présent dans la commande.
+
+    Appelé par passer_commande une fois les lignes rattachées à la commande.
+    """
+    user = commande.customer.user if commande.customer_id else None
+    client = texte(f"{user.first_name} {user.last_name}") if user is not None else ''
+
+    parts = {}
+    for etablissement_id, nom in commande.produit_commande.order_by('id').values_list('etablissement_id', 'nom_produit'):
+        parts.setdefault(etablissement_id, []).append(nom or '')
+
+    CommandeEtablissement.objects.bulk_create([
+        CommandeEtablissement(
+            etablissement_id=etablissement_id, commande=commande, date_add=commande.date_add, status=commande.status,
+            nom_produit=noms[0], client=client, produits='\n'.join(texte(nom) for nom in noms),
+        )
+        for etablissement_id, noms in parts.items() if etablissement_id is not None
+    ], ignore_conflicts=True)
+
+
+def _debut_du_jour(jour):
+    return timezone.make_aware(datetime.datetime.combine(jour, datetime.time.min))
+
+
+def lire_filtres(params):
+    """Filtres de la boîte (?client=&produit=&status=&date_min=&date_max=), valeurs vides ou invalides ignorées."""
+    filtres = {}
+    for nom in ('client', 'produit'):
+        valeur = texte(params.get(nom))
+        if valeur:
+            filtres[nom] = valeur
+    if params.get('status') in ('payée', 'attente'):
+        filtres['status'] = params['status']
+    for nom in ('date_min', 'date_max'):
+        try:
+            filtres[nom] = datetime.date.fromisoformat(params.get(nom) or '')
+        except ValueError:
+            pass
+    return filtres
+
+
+def boite_commandes(etablissement, filtres):
+    """Entrées de la boîte de l'établissement, des plus récentes aux plus anciennes."""
+    boite = CommandeEtablissement.objects.filter(etablissement=etablissement)
+    if 'status' in filtres:
+        boite = boite.filter(status=filtres['status'] == 'payée')
+    if 'date_min' in filtres:
+        boite = boite.filter(date_add__gte=_debut_du_jour(filtres['date_min']))
+    if 'date_max' in filtres:
+        # Jusqu'à la fin du jour demandé
+        boite = boite.filter(date_add__lt=_debut_du_jour(filtres['date_max'] + datetime.timedelta(days=1)))
+    if 'client' in filtres:
+        boite = boite.filter(client__contains=filtres['client'])
+    if 'produit' in filtres:
+        boite = boite.filter(produits__contains=filtres['produit'])
+    return boite.order_by('-date_add', '-id')
+
+
+def _cle_version(etablissement_id):
+    return f'boite:version:{etablissement_id}'
+
+
+def invalider_nombres(etablissement_ids):
+    """Rend caducs les comptes filtrés en cache des boîtes (changement de statut d'une commande)."""
+    cache.set_many({_cle_version(etablissement_id): time.time_ns() for etablissement_id in etablissement_ids}, None)
+
+
+def nombre_commandes(etablissement, filtres):
+    """Nombre d'entrées de la boîte, sans COUNT sur l'historique à chaque page.
+
+    Sans filtre, c'est le compteur de commandes du tableau de bord. Avec
+    filtres, le COUNT est mis en cache sous une clé qui inclut ce compteur
+    et la version de la boîte : une nouvelle commande ou un changement de
+    statut rend les résultats en cache caducs.
+    """
+    total = StatistiquesEtablissement.objects.filter(etablissement=etablissement).values_list('nb_commandes', flat=True).first() or 0
+    if not filtres:
+        return total
+
+    signature = hashlib.md5(json.dumps(filtres, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+    version = cache.get(_cle_version(etablissement.id), 0)
+    cle = f'boite:{etablissement.id}:{total}:{version}:{signature}'
+    return cache.get_or_set(
+        cle, lambda: boite_commandes(etablissement, filtres).count(), getattr(settings, 'SHOP_INBOX_COUNT_TIMEOUT', 300),
+    )
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from shop.models import StatistiquesEtablissement
+from shop.statistiques import recalculer
+
+
+class Command(BaseCommand):
+    help = "Reconstruit les compteurs du tableau de bord vendeur à partir des commandes"
+
+    def add_arguments(self, parser):
+        parser.add_argument("etablissements", nargs="*", type=int, help="Ids des établissements (tous par défaut)")
+
+    def handle(self, *args, **options):
+        recalculer(options["etablissements"] or None)
+        self.stdout.write(self.style.SUCCESS(f"{StatistiquesEtablissement.objects.count()} établissements recalculés."))
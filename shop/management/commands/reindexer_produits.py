@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from shop.models import Produit
+from shop.search import get_backend
+
+
+class Command(BaseCommand):
+    help = "Reconstruit l'index de recherche des produits"
+
+    def handle(self, *args, **options):
+        produits = Produit.objects.select_related('categorie', 'etablissement')
+        get_backend().reindexer(produits.iterator())
+        self.stdout.write(self.style.SUCCESS(f"{produits.count()} produits indexés."))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from shop.statistiques import remplir_ventes
+
+
+class Command(BaseCommand):
+    help = "Reconstruit le cumul journalier des ventes par produit (VentesProduitJour) à partir des commandes"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--taille", type=int, default=1000, help="Nombre de commandes par paquet")
+
+    def handle(self, *args, **options):
+        total = 0
+        for traitees in remplir_ventes(options["taille"]):
+            total += traitees
+            self.stdout.write(f"{total} commande(s) traitée(s)…")
+        self.stdout.write(self.style.SUCCESS(f"Cumul des ventes reconstruit sur {total} commande(s)."))
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0017_produit_quantite'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='produit',
+            index=models.Index(fields=['status', '-date_add', '-id'], name='produit_catalogue_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0018_produit_catalogue_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='produit',
+            index=models.Index(fields=['date_debut_promo', 'date_fin_promo'], name='produit_promo_idx'),
+        ),
+    ]
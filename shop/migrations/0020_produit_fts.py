@@ -0,0 +1,79 @@
+import re
+import unicodedata
+
+from django.db import migrations
+
+
+# Copie figée de shop.search au moment de cette migration : le module peut évoluer,
+# l'index construit ici ne doit pas changer avec lui
+TABLE_FTS = 'shop_produit_fts'
+
+SUFFIXES = (
+    'issements', 'issement', 'atrices', 'ateurs', 'ations', 'ements', 'atrice', 'ateur',
+    'ation', 'ement', 'ances', 'ences', 'euses', 'ites', 'ance', 'ence', 'euse', 'ives',
+    'eaux', 'aux', 'eux', 'ite', 'ive', 'ifs', 'es', 'if', 'e', 's', 'x',
+)
+
+
+def normaliser(texte):
+    texte = unicodedata.normalize('NFKD', texte or '')
+    texte = ''.join(c for c in texte if not unicodedata.combining(c))
+    return re.findall(r'\w+', texte.lower())
+
+
+def raciner(mot):
+    for suffixe in SUFFIXES:
+        if mot.endswith(suffixe) and len(mot) - len(suffixe) >= 3:
+            return mot[:-len(suffixe)]
+    return mot
+
+
+def analyser(texte):
+    return ' '.join(raciner(mot) for mot in normaliser(texte))
+
+
+def document(produit):
+    return (
+        analyser(produit.nom),
+        analyser(produit.description),
+        analyser(produit.description_deal),
+        analyser(produit.categorie.nom if produit.categorie_id else ''),
+        analyser(produit.etablissement.nom if produit.etablissement_id else ''),
+    )
+
+
+def creer_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    Produit = apps.get_model('shop', 'Produit')
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS {} USING fts5("
+            "nom, description, description_deal, categorie, etablissement, "
+            "etablissement_id UNINDEXED, status UNINDEXED, "
+            "tokenize = 'unicode61 remove_diacritics 2')".format(TABLE_FTS)
+        )
+        for produit in Produit.objects.select_related('categorie', 'etablissement').iterator():
+            cursor.execute(
+                'INSERT INTO {} (rowid, nom, description, description_deal, categorie, etablissement, '
+                'etablissement_id, status) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)'.format(TABLE_FTS),
+                [produit.id, *document(produit), produit.etablissement_id, int(produit.status)],
+            )
+
+
+def supprimer_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('DROP TABLE IF EXISTS {}'.format(TABLE_FTS))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0019_produit_promo_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(creer_index, supprimer_index),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, ExpressionWrapper, F, FloatField, Sum
+from django.db.models.functions import TruncDate
+
+
+def remplir_statistiques(apps, schema_editor):
+    ProduitPanier = apps.get_model('customer', 'ProduitPanier')
+    StatistiquesEtablissement = apps.get_model('shop', 'StatistiquesEtablissement')
+    StatistiquesJour = apps.get_model('shop', 'StatistiquesJour')
+    montant = ExpressionWrapper(F('prix_unitaire') * F('quantite'), output_field=FloatField())
+    lignes = ProduitPanier.objects.filter(commande__isnull=False)
+
+    totaux = lignes.values('produit__etablissement_id').annotate(
+        nb=Count('commande_id', distinct=True), ca=Sum(montant),
+    ).order_by()
+    StatistiquesEtablissement.objects.bulk_create([
+        StatistiquesEtablissement(etablissement_id=t['produit__etablissement_id'], nb_commandes=t['nb'], chiffre_affaires=t['ca'] or 0)
+        for t in totaux
+    ], batch_size=500)
+
+    jours = lignes.annotate(jour=TruncDate('commande__date_add')).values('produit__etablissement_id', 'jour').annotate(
+        nb=Count('commande_id', distinct=True), ca=Sum(montant),
+    ).order_by()
+    StatistiquesJour.objects.bulk_create([
+        StatistiquesJour(etablissement_id=j['produit__etablissement_id'], jour=j['jour'], nb_commandes=j['nb'], chiffre_affaires=j['ca'] or 0)
+        for j in jours
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0020_produit_fts'),
+        ('customer', '0011_commande_recu_empreinte'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatistiquesEtablissement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nb_commandes', models.PositiveIntegerField(default=0)),
+                ('chiffre_affaires', models.FloatField(default=0)),
+                ('date_update', models.DateTimeField(auto_now=True)),
+                ('etablissement', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='statistiques', to='shop.etablissement')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='StatistiquesJour',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('jour', models.DateField()),
+                ('nb_commandes', models.PositiveIntegerField(default=0)),
+                ('chiffre_affaires', models.FloatField(default=0)),
+                ('etablissement', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='statistiques_jour', to='shop.etablissement')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('etablissement', 'jour'), name='statistiques_jour_unique')],
+            },
+        ),
+        migrations.RunPython(remplir_statistiques, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0021_statistiques_etablissement'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VentesProduitJour',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('jour', models.DateField()),
+                ('quantite', models.PositiveIntegerField(default=0)),
+                ('chiffre_affaires', models.FloatField(default=0)),
+                ('nb_commandes', models.PositiveIntegerField(default=0)),
+                ('etablissement', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ventes_jour', to='shop.etablissement')),
+                ('produit', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ventes_jour', to='shop.produit')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['etablissement', 'jour'], name='ventes_etablissement_jour_idx')],
+                'constraints': [models.UniqueConstraint(fields=('etablissement', 'produit', 'jour'), name='ventes_produit_jour_unique')],
+            },
+        ),
+    ]
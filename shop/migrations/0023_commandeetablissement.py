@@ -0,0 +1,76 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:04
+
+import re
+import unicodedata
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def normaliser(texte):
+    # Copie figée de shop.search.normaliser au moment de cette migration
+    texte = unicodedata.normalize('NFKD', texte or '')
+    texte = ''.join(c for c in texte if not unicodedata.combining(c))
+    return re.findall(r'\w+', texte.lower())
+
+
+def remplir_boites(apps, schema_editor):
+    ProduitPanier = apps.get_model('customer', 'ProduitPanier')
+    CommandeEtablissement = apps.get_model('shop', 'CommandeEtablissement')
+
+    def texte(valeur):
+        return ' '.join(normaliser(valeur))
+
+    lignes = (
+        ProduitPanier.objects.filter(commande__isnull=False, etablissement__isnull=False)
+        .order_by('commande_id', 'etablissement_id', 'id')
+        .values_list(
+            'commande_id', 'etablissement_id', 'nom_produit', 'commande__date_add', 'commande__status',
+            'commande__customer__user__first_name', 'commande__customer__user__last_name',
+        )
+    )
+    parts, lot = {}, []
+    for commande_id, etablissement_id, nom, date_add, status, prenom, nom_client in lignes.iterator(chunk_size=2000):
+        part = parts.get((commande_id, etablissement_id))
+        if part is None:
+            # Lignes triées par commande : les parts déjà en lot sont complètes
+            if len(lot) >= 1000:
+                CommandeEtablissement.objects.bulk_create(lot)
+                parts, lot = {}, []
+            part = parts[commande_id, etablissement_id] = CommandeEtablissement(
+                commande_id=commande_id, etablissement_id=etablissement_id, date_add=date_add, status=status,
+                nom_produit=nom or '', client=texte(f"{prenom or ''} {nom_client or ''}"), produits=texte(nom),
+            )
+            lot.append(part)
+        else:
+            part.produits += '\n' + texte(nom)
+    CommandeEtablissement.objects.bulk_create(lot)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customer', '0012_produitpanier_etablissement'),
+        ('shop', '0022_ventesproduitjour'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CommandeEtablissement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date_add', models.DateTimeField()),
+                ('status', models.BooleanField(default=True)),
+                ('nom_produit', models.CharField(blank=True, max_length=254)),
+                ('client', models.CharField(blank=True, max_length=300)),
+                ('produits', models.TextField(blank=True)),
+                ('commande', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='parts_etablissement', to='customer.commande')),
+                ('etablissement', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='boite_commandes', to='shop.etablissement')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['etablissement', '-date_add', '-id'], name='boite_date_idx'), models.Index(fields=['etablissement', 'status', '-date_add', '-id'], name='boite_status_date_idx')],
+                'constraints': [models.UniqueConstraint(fields=('etablissement', 'commande'), name='commande_etablissement_unique')],
+            },
+        ),
+        migrations.RunPython(remplir_boites, migrations.RunPython.noop),
+    ]
@@ -6,6 +6,38 @@ from django.contrib.auth.models import User
 from cities_light.models import City
 
 
+def promotion_en_cours(prefixe=''):
+    """Condition SQL équivalente à Produit.check_promotion."""
+    today = datetime.date.today()
+    return models.Q(**{
+        prefixe + 'date_debut_promo__lte': today,
+        prefixe + 'date_fin_promo__gte': today,
+    })
+
+
+def prix_effectif(prefixe=''):
+    """Expression SQL du prix appliqué : prix promotionnel si la promotion est en cours."""
+    return models.Case(
+        models.When(promotion_en_cours(prefixe), then=models.F(prefixe + 'prix_promotionnel')),
+        default=models.F(prefixe + 'prix'),
+        output_field=models.FloatField(),
+    )
+
+
+class ProduitQuerySet(models.QuerySet):
+
+    def avec_promotion(self):
+        """Annote effective_price et is_on_promo, évalués par la base de données."""
+        return self.annotate(
+            effective_price=prix_effectif(),
+            is_on_promo=models.Case(
+                models.When(promotion_en_cours(), then=models.Value(True)),
+                default=models.Value(False),
+                output_field=models.BooleanField(),
+            ),
+        )
+
+
 # Create your models here.
 class CategorieEtablissement(models.Model):
 
@@ -111,30 +143,32 @@ class Produit(models.Model):
     status = models.BooleanField(default=True)
     slug = models.SlugField(unique=True, editable=False, null=True,  blank=True)
 
+    objects = ProduitQuerySet.as_manager()
+
     def save(self, *args, **kwargs):
         if not self.slug or self.slug is None:
             self.slug = '-'.join((slugify(self.nom), slugify(datetime.datetime.now().microsecond)))
         self.categorie_etab = self.etablissement.categorie
         super(Produit, self).save(*args, **kwargs)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', '-date_add', '-id'], name='produit_catalogue_idx'),
+            models.Index(fields=['date_debut_promo', 'date_fin_promo'], name='produit_promo_idx'),
+        ]
+
     def __str__(self):
         return self.nom
 
     @property
     def check_promotion(self):
-        result = True
-        if self.date_debut_promo:
-            if self.date_debut_promo > datetime.date.today():
-                result = False
-        else:
-            result = False
-        if self.date_fin_promo:
-            if self.date_fin_promo < datetime.date.today():
-                result = False
-        else:
-            result=False
-        
-        return result
+        # Valeur calculée en SQL si le queryset a été annoté avec avec_promotion()
+        if hasattr(self, 'is_on_promo'):
+            return self.is_on_promo
+        if not self.date_debut_promo or not self.date_fin_promo:
+            return False
+        today = datetime.date.today()
+        return self.date_debut_promo <= today <= self.date_fin_promo
 
 
 class Favorite(models.Model):
@@ -151,3 +185,81 @@ class Favorite(models.Model):
     def __str__(self):
         return f"{self.user.username} - {self.produit.nom}"
 
+
+
+class StatistiquesEtablissement(models.Model):
+    """Compteurs cumulés d'un établissement, incrémentés à chaque commande (shop.statistiques)."""
+
+    etablissement = models.OneToOneField(Etablissement, related_name='statistiques', on_delete=models.CASCADE)
+    nb_commandes = models.PositiveIntegerField(default=0)
+    chiffre_affaires = models.FloatField(default=0)
+    date_update = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Statistiques {self.etablissement}"
+
+
+class StatistiquesJour(models.Model):
+    """Commandes et chiffre d'affaires d'un établissement pour une journée."""
+
+    etablissement = models.ForeignKey(Etablissement, related_name='statistiques_jour', on_delete=models.CASCADE)
+    jour = models.DateField()
+    nb_commandes = models.PositiveIntegerField(default=0)
+    chiffre_affaires = models.FloatField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['etablissement', 'jour'], name='statistiques_jour_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.etablissement} {self.jour}"
+
+
+class VentesProduitJour(models.Model):
+    """Ventes agrégées d'un produit pour une journée, alimentées à chaque commande."""
+
+    etablissement = models.ForeignKey(Etablissement, related_name='ventes_jour', on_delete=models.CASCADE)
+    produit = models.ForeignKey(Produit, related_name='ventes_jour', on_delete=models.CASCADE)
+    jour = models.DateField()
+    quantite = models.PositiveIntegerField(default=0)
+    chiffre_affaires = models.FloatField(default=0)
+    nb_commandes = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['etablissement', 'produit', 'jour'], name='ventes_produit_jour_unique'),
+        ]
+        indexes = [models.Index(fields=['etablissement', 'jour'], name='ventes_etablissement_jour_idx')]
+
+    def __str__(self):
+        return f"{self.produit} {self.jour}"
+
+
+class CommandeEtablissement(models.Model):
+    """Part d'une commande dans la boîte de commandes d'un vendeur (shop.commandes).
+
+    Date, statut, client et produits sont recopiés de la commande : les
+    filtres de la boîte restent dans les index de l'établissement.
+    """
+
+    etablissement = models.ForeignKey(Etablissement, related_name='boite_commandes', on_delete=models.CASCADE)
+    commande = models.ForeignKey('customer.Commande', related_name='parts_etablissement', on_delete=models.CASCADE)
+    date_add = models.DateTimeField()
+    status = models.BooleanField(default=True)
+    nom_produit = models.CharField(max_length=254, blank=True)
+    # Textes normalisés (minuscules, sans accents) pour les recherches client / produit
+    client = models.CharField(max_length=300, blank=True)
+    produits = models.TextField(blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['etablissement', 'commande'], name='commande_etablissement_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['etablissement', '-date_add', '-id'], name='boite_date_idx'),
+            models.Index(fields=['etablissement', 'status', '-date_add', '-id'], name='boite_status_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.etablissement} commande {self.commande_id}"
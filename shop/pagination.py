@@ -0,0 +1,56 @@
+import base64
+import datetime
+import json
+
+from django.conf import settings
+from django.db.models import Q
+
+
+def taille_page(request):
+    """Taille de page demandée (?taille=), bornée par SHOP_MAX_PAGE_SIZE."""
+    defaut = getattr(settings, 'SHOP_PAGE_SIZE', 12)
+    maximum = getattr(settings, 'SHOP_MAX_PAGE_SIZE', 48)
+    try:
+        taille = int(request.GET.get('taille', defaut))
+    except (TypeError, ValueError):
+        taille = defaut
+    return max(1, min(taille, maximum))
+
+
+def encode_curseur(objet):
+    valeur = json.dumps([objet.date_add.isoformat(), objet.id])
+    return base64.urlsafe_b64encode(valeur.encode('utf-8')).decode('ascii')
+
+
+def decode_curseur(curseur):
+    """Retourne (date_add, id) ou None si le curseur est absent ou invalide."""
+    if not curseur:
+        return None
+    try:
+        date_add, pk = json.loads(base64.urlsafe_b64decode(curseur.encode('ascii')))
+        return datetime.datetime.fromisoformat(date_add), int(pk)
+    except (ValueError, TypeError, UnicodeError):
+        return None
+
+
+def page_par_cle(queryset, curseur, taille):
+    """Pagination par clé (date_add, id) décroissante, pour tout modèle ayant ces deux champs.
+
+    Le coût d'une page ne dépend pas de sa profondeur : on filtre sur la
+    dernière clé vue au lieu de faire un OFFSET.
+    """
+    queryset = queryset.order_by('-date_add', '-id')
+    position = decode_curseur(curseur)
+    if position is not None:
+        date_add, pk = position
+        queryset = queryset.filter(Q(date_add__lt=date_add) | Q(date_add=date_add, id__lt=pk))
+
+    objets = list(queryset[:taille + 1])
+    suivant = None
+    if len(objets) > taille:
+        objets = objets[:taille]
+        suivant = encode_curseur(objets[-1])
+    return objets, suivant
+
+
+page_produits = page_par_cle
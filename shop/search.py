@@ -0,0 +1,154 @@
+import re
+import unicodedata
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.utils.module_loading import import_string
+
+
+TABLE_FTS = 'shop_produit_fts'
+
+# Suffixes retirés par le raciniseur léger (du plus long au plus court)
+SUFFIXES = (
+    'issements', 'issement', 'atrices', 'ateurs', 'ations', 'ements', 'atrice', 'ateur',
+    'ation', 'ement', 'ances', 'ences', 'euses', 'ites', 'ance', 'ence', 'euse', 'ives',
+    'eaux', 'aux', 'eux', 'ite', 'ive', 'ifs', 'es', 'if', 'e', 's', 'x',
+)
+
+
+def normaliser(texte):
+    """Minuscules, sans accents, découpé en mots."""
+    texte = unicodedata.normalize('NFKD', texte or '')
+    texte = ''.join(c for c in texte if not unicodedata.combining(c))
+    return re.findall(r'\w+', texte.lower())
+
+
+def raciner(mot):
+    """Raciniseur français léger : « chaussures » et « chaussure » donnent « chaussur »."""
+    for suffixe in SUFFIXES:
+        if mot.endswith(suffixe) and len(mot) - len(suffixe) >= 3:
+            return mot[:-len(suffixe)]
+    return mot
+
+
+def analyser(texte):
+    return ' '.join(raciner(mot) for mot in normaliser(texte))
+
+
+def document(produit):
+    """Colonnes indexées d'un produit, dans l'ordre de la table FTS."""
+    return (
+        analyser(produit.nom),
+        analyser(produit.description),
+        analyser(produit.description_deal),
+        analyser(produit.categorie.nom if produit.categorie_id else ''),
+        analyser(produit.etablissement.nom if produit.etablissement_id else ''),
+    )
+
+
+class BaseSearchBackend:
+
+    def indexer(self, produit):
+        pass
+
+    def supprimer(self, produit_id):
+        pass
+
+    def reindexer(self, produits):
+        for produit in produits:
+            self.indexer(produit)
+
+    def rechercher(self, requete, limite=None, decalage=0, status=None, etablissement_id=None):
+        """Retourne les ids des produits correspondants, les plus pertinents en premier."""
+        raise NotImplementedError
+
+
+class FTS5SearchBackend(BaseSearchBackend):
+    """Index inversé SQLite FTS5, classé par bm25 (le nom pèse le plus lourd)."""
+
+    poids = (10.0, 1.0, 2.0, 3.0, 3.0)
+
+    def indexer(self, produit):
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM {} WHERE rowid = %s'.format(TABLE_FTS), [produit.id])
+            cursor.execute(
+                'INSERT INTO {} (rowid, nom, description, description_deal, categorie, etablissement, '
+                'etablissement_id, status) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)'.format(TABLE_FTS),
+                [produit.id, *document(produit), produit.etablissement_id, int(produit.status)],
+            )
+
+    def supprimer(self, produit_id):
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM {} WHERE rowid = %s'.format(TABLE_FTS), [produit_id])
+
+    def reindexer(self, produits):
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM {}'.format(TABLE_FTS))
+        super().reindexer(produits)
+
+    def rechercher(self, requete, limite=None, decalage=0, status=None, etablissement_id=None):
+        termes = analyser(requete).split()
+        if not termes:
+            return []
+        # Chaque terme est cherché en préfixe : « chauss » trouve « chaussur »
+        sql = 'SELECT rowid FROM {0} WHERE {0} MATCH %s'.format(TABLE_FTS)
+        params = [' '.join('"{}"*'.format(terme) for terme in termes)]
+        if status is not None:
+            sql += ' AND status = %s'
+            params.append(int(status))
+        if etablissement_id is not None:
+            sql += ' AND etablissement_id = %s'
+            params.append(etablissement_id)
+        sql += ' ORDER BY bm25({}, {}) LIMIT %s OFFSET %s'.format(TABLE_FTS, ', '.join(map(str, self.poids)))
+        params += [-1 if limite is None else limite, decalage]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [row[0] for row in cursor.fetchall()]
+
+
+class ORMSearchBackend(BaseSearchBackend):
+    """Repli pour les bases sans FTS5 : recherche icontains, sans classement."""
+
+    def rechercher(self, requete, limite=None, decalage=0, status=None, etablissement_id=None):
+        from .models import Produit
+
+        produits = Produit.objects.all()
+        for mot in requete.split():
+            produits = produits.filter(
+                Q(nom__icontains=mot) | Q(description__icontains=mot) | Q(description_deal__icontains=mot)
+                | Q(categorie__nom__icontains=mot) | Q(etablissement__nom__icontains=mot)
+            )
+        if status is not None:
+            produits = produits.filter(status=status)
+        if etablissement_id is not None:
+            produits = produits.filter(etablissement_id=etablissement_id)
+        ids = produits.order_by('-date_add', '-id').values_list('id', flat=True)
+        fin = None if limite is None else decalage + limite
+        return list(ids[decalage:fin])
+
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        chemin = getattr(settings, 'SHOP_SEARCH_BACKEND', None)
+        if chemin is None:
+            chemin = 'shop.search.FTS5SearchBackend' if connection.vendor == 'sqlite' else 'shop.search.ORMSearchBackend'
+        _backend = import_string(chemin)()
+    return _backend
+
+
+def rechercher_produits(requete, decalage, taille, **filtres):
+    """Page de résultats classés : (produits, décalage de la page suivante ou None)."""
+    from .models import Produit
+
+    ids = get_backend().rechercher(requete, limite=taille + 1, decalage=decalage, **filtres)
+    suivant = None
+    if len(ids) > taille:
+        ids = ids[:taille]
+        suivant = decalage + taille
+    produits = Produit.objects.avec_promotion().in_bulk(ids)
+    return [produits[i] for i in ids if i in produits], suivant
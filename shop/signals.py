@@ -0,0 +1,44 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from customer.models import Commande
+
+from .commandes import invalider_nombres
+from .models import CategorieProduit, CommandeEtablissement, Etablissement, Produit
+from .search import get_backend
+
+
+# Mise à jour incrémentale de l'index de recherche des produits
+@receiver(post_save, sender=Produit)
+def indexer_produit(sender, instance, **kwargs):
+    get_backend().indexer(instance)
+
+
+@receiver(post_delete, sender=Produit)
+def desindexer_produit(sender, instance, **kwargs):
+    get_backend().supprimer(instance.id)
+
+
+@receiver(post_save, sender=CategorieProduit)
+def reindexer_categorie(sender, instance, created, **kwargs):
+    if not created:
+        for produit in instance.produit.select_related('categorie', 'etablissement'):
+            get_backend().indexer(produit)
+
+
+@receiver(post_save, sender=Etablissement)
+def reindexer_etablissement(sender, instance, created, **kwargs):
+    if not created:
+        for produit in instance.produits.select_related('categorie', 'etablissement'):
+            get_backend().indexer(produit)
+
+
+# Le statut recopié dans les boîtes de commandes des vendeurs suit la commande
+@receiver(post_save, sender=Commande)
+def statut_commande(sender, instance, created, **kwargs):
+    if not created:
+        parts = CommandeEtablissement.objects.filter(commande=instance).exclude(status=instance.status)
+        etablissement_ids = list(parts.values_list('etablissement_id', flat=True))
+        if etablissement_ids:
+            parts.update(status=instance.status)
+            invalider_nombres(etablissement_ids)
@@ -0,0 +1,154 @@
+import datetime
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, ExpressionWrapper, F, FloatField, Max, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from customer.models import ProduitPanier
+
+from .models import Etablissement, Produit, StatistiquesEtablissement, StatistiquesJour, VentesProduitJour
+
+
+MONTANT_LIGNE = ExpressionWrapper(F('prix_unitaire') * F('quantite'), output_field=FloatField())
+
+
+def _incrementer(modele, cles, **increments):
+    """UPDATE champ = champ + n sur la ligne `cles`, créée si elle n'existe pas encore."""
+    maj = {champ: F(champ) + valeur for champ, valeur in increments.items()}
+    if modele.objects.filter(**cles).update(**maj):
+        return
+    try:
+        with transaction.atomic():
+            modele.objects.create(**cles, **increments)
+    except IntegrityError:
+        # Créée entre-temps par une commande concurrente
+        modele.objects.filter(**cles).update(**maj)
+
+
+def enregistrer_commande(commande):
+    """Ajoute la commande aux compteurs de chaque établissement dont elle contient des produits.
+
+    Appelé par passer_commande, dans sa transaction : les compteurs ne
+    comptent jamais une commande annulée par un rollback.
+    """
+    jour = timezone.localdate(commande.date_add)
+    ventes = (
+        ProduitPanier.objects.filter(commande=commande)
+        .values_list('etablissement_id', 'produit_id')
+        .annotate(qte=Sum('quantite'), ca=Sum(MONTANT_LIGNE))
+        .order_by()
+    )
+    par_etablissement = {}
+    for etablissement_id, produit_id, quantite, ca in ventes:
+        _incrementer(
+            VentesProduitJour, {'etablissement_id': etablissement_id, 'produit_id': produit_id, 'jour': jour},
+            quantite=quantite, chiffre_affaires=ca or 0, nb_commandes=1,
+        )
+        par_etablissement[etablissement_id] = par_etablissement.get(etablissement_id, 0) + (ca or 0)
+
+    for etablissement_id, ca in par_etablissement.items():
+        _incrementer(StatistiquesEtablissement, {'etablissement_id': etablissement_id}, nb_commandes=1, chiffre_affaires=ca)
+        _incrementer(StatistiquesJour, {'etablissement_id': etablissement_id, 'jour': jour}, nb_commandes=1, chiffre_affaires=ca)
+
+
+def tableau_de_bord(etablissement):
+    """Indicateurs du tableau de bord, en une seule requête quelle que soit la taille de l'historique."""
+    articles = Produit.objects.filter(etablissement=OuterRef('id')).order_by().values('etablissement').annotate(n=Count('id'))
+    jour = StatistiquesJour.objects.filter(etablissement=OuterRef('id'), jour=timezone.localdate())
+    return Etablissement.objects.filter(id=etablissement.id).values(
+        total_articles=Coalesce(Subquery(articles.values('n')), 0),
+        total_commandes=Coalesce(F('statistiques__nb_commandes'), 0),
+        chiffre_affaires=Coalesce(F('statistiques__chiffre_affaires'), Value(0.0)),
+        commandes_aujourdhui=Coalesce(Subquery(jour.values('nb_commandes')), 0),
+        chiffre_affaires_aujourdhui=Coalesce(Subquery(jour.values('chiffre_affaires')), Value(0.0)),
+    ).get()
+
+
+@transaction.atomic
+def recalculer(etablissement_ids=None):
+    """Reconstruit les compteurs à partir des lignes de commande (reprise de l'historique)."""
+    lignes = ProduitPanier.objects.filter(commande__isnull=False)
+    if etablissement_ids is not None:
+        lignes = lignes.filter(etablissement_id__in=etablissement_ids)
+        StatistiquesEtablissement.objects.filter(etablissement_id__in=etablissement_ids).delete()
+        StatistiquesJour.objects.filter(etablissement_id__in=etablissement_ids).delete()
+    else:
+        StatistiquesEtablissement.objects.all().delete()
+        StatistiquesJour.objects.all().delete()
+
+    totaux = lignes.values('etablissement_id').annotate(
+        nb=Count('commande_id', distinct=True), ca=Sum(MONTANT_LIGNE),
+    ).order_by()
+    StatistiquesEtablissement.objects.bulk_create([
+        StatistiquesEtablissement(etablissement_id=t['etablissement_id'], nb_commandes=t['nb'], chiffre_affaires=t['ca'] or 0)
+        for t in totaux
+    ], batch_size=500)
+
+    jours = lignes.annotate(jour=TruncDate('commande__date_add')).values('etablissement_id', 'jour').annotate(
+        nb=Count('commande_id', distinct=True), ca=Sum(MONTANT_LIGNE),
+    ).order_by()
+    StatistiquesJour.objects.bulk_create((
+        StatistiquesJour(etablissement_id=j['etablissement_id'], jour=j['jour'], nb_commandes=j['nb'], chiffre_affaires=j['ca'] or 0)
+        for j in jours.iterator()
+    ), batch_size=500)
+
+
+def remplir_ventes(taille=1000):
+    """Reconstruit VentesProduitJour à partir de l'historique, par paquets de `taille` commandes.
+
+    Une commande n'est jamais coupée entre deux paquets : les sommes
+    partielles s'additionnent exactement. Comme recalculer, l'effacement et
+    la reconstruction forment une seule transaction : le tableau de bord ne
+    voit jamais un cumul partiel. Seules les commandes existant au départ
+    sont reprises, celles passées pendant la reconstruction étant déjà
+    comptées par enregistrer_commande. Génère le nombre de commandes
+    traitées après chaque paquet.
+    """
+    from customer.models import Commande
+
+    with transaction.atomic():
+        borne = Commande.objects.aggregate(borne=Max('id'))['borne'] or 0
+        VentesProduitJour.objects.all().delete()
+        dernier = 0
+        while True:
+            ids = list(
+                Commande.objects.filter(id__gt=dernier, id__lte=borne).order_by('id').values_list('id', flat=True)[:taille]
+            )
+            if not ids:
+                return
+            dernier = ids[-1]
+            groupes = (
+                ProduitPanier.objects.filter(commande_id__gte=ids[0], commande_id__lte=dernier)
+                .annotate(jour=TruncDate('commande__date_add'))
+                .values_list('etablissement_id', 'produit_id', 'jour')
+                .annotate(qte=Sum('quantite'), ca=Sum(MONTANT_LIGNE), nb=Count('commande_id', distinct=True))
+                .order_by()
+            )
+            for etablissement_id, produit_id, jour, quantite, ca, nb in groupes:
+                _incrementer(
+                    VentesProduitJour, {'etablissement_id': etablissement_id, 'produit_id': produit_id, 'jour': jour},
+                    quantite=quantite, chiffre_affaires=ca or 0, nb_commandes=nb,
+                )
+            yield len(ids)
+
+
+def meilleures_ventes(etablissement, jours=30, limite=5):
+    """Produits les plus vendus sur les `jours` derniers jours, lus sur le cumul journalier."""
+    debut = timezone.localdate() - datetime.timedelta(days=jours - 1)
+    return list(
+        VentesProduitJour.objects.filter(etablissement=etablissement, jour__gte=debut)
+        .values('produit_id', 'produit__nom')
+        .annotate(quantite=Sum('quantite'), chiffre_affaires=Sum('chiffre_affaires'))
+        .order_by('-quantite')[:limite]
+    )
+
+
+def ventes_par_jour(etablissement, debut, fin):
+    """[(jour, quantité, chiffre d'affaires)] entre deux dates incluses, pour les graphiques et exports."""
+    return list(
+        VentesProduitJour.objects.filter(etablissement=etablissement, jour__range=(debut, fin))
+        .values_list('jour')
+        .annotate(quantite=Sum('quantite'), chiffre_affaires=Sum('chiffre_affaires'))
+        .order_by('jour')
+    )
@@ -1,6 +1,7 @@
 import json
+import datetime
 from bs4 import BeautifulSoup
-from django.test import TestCase, RequestFactory, Client
+from django.test import TestCase, RequestFactory, Client, override_settings
 from django.contrib.auth.models import User, AnonymousUser
 from unittest.mock import patch, MagicMock
 from django.urls import reverse
@@ -9,6 +10,8 @@ from django.core.files.uploadedfile import SimpleUploadedFile
 # Imports modèles
 from shop.models import CategorieProduit, Favorite, Produit, CategorieEtablissement, Etablissement 
 from customer.models import Customer  # Nécessaire pour paiement_success
+from shop.search import get_backend
+from website.images import url_derive
 
 # Imports vues
 from shop.views import (
@@ -120,6 +123,86 @@ class ShopTests(TestCase):
         self.assertEqual(response.status_code, 200)
 
 
+    def test_avec_promotion_annotations(self):
+        today = datetime.date.today()
+        self.produit.date_debut_promo = today - datetime.timedelta(days=1)
+        self.produit.date_fin_promo = today + datetime.timedelta(days=1)
+        self.produit.save()
+        expire = Produit.objects.create(
+            nom="Promo expirée",
+            description="Description produit",
+            description_deal="Deal",
+            prix=300,
+            prix_promotionnel=200,
+            date_debut_promo=today - datetime.timedelta(days=10),
+            date_fin_promo=today - datetime.timedelta(days=1),
+            categorie=self.categorie_produit,
+            etablissement=self.etab,
+        )
+
+        produits = {p.id: p for p in Produit.objects.avec_promotion()}
+        self.assertTrue(produits[self.produit.id].is_on_promo)
+        self.assertEqual(produits[self.produit.id].effective_price, 80)
+        self.assertFalse(produits[expire.id].is_on_promo)
+        self.assertEqual(produits[expire.id].effective_price, 300)
+        self.assertEqual(produits[self.produit.id].check_promotion, self.produit.check_promotion)
+
+        response = self.client.get(reverse('shop'), {'prix_max': 100})
+        self.assertEqual([p.id for p in response.context['produits']], [self.produit.id])
+
+    # === Recherche plein texte ===
+    def test_recherche_accents_et_pluriels(self):
+        massage = Produit.objects.create(
+            nom="Massages relaxants",
+            description="Séance au hammam",
+            description_deal="Deal",
+            prix=100,
+            categorie=self.categorie_produit,
+            etablissement=self.etab,
+        )
+        backend = get_backend()
+        self.assertEqual(backend.rechercher("massage"), [massage.id])
+        self.assertEqual(backend.rechercher("SEANCE"), [massage.id])
+        self.assertEqual(backend.rechercher("hamm"), [massage.id])
+        # Nom de l'établissement indexé
+        self.assertIn(massage.id, backend.rechercher("boutique"))
+
+        massage.delete()
+        self.assertEqual(backend.rechercher("massage"), [])
+
+    def test_recherche_classement_par_nom(self):
+        dans_description = Produit.objects.create(
+            nom="Menu du jour",
+            description="Avec dessert au chocolat",
+            description_deal="Deal",
+            prix=100,
+            categorie=self.categorie_produit,
+            etablissement=self.etab,
+        )
+        dans_nom = Produit.objects.create(
+            nom="Fondant au chocolat",
+            description="Dessert",
+            description_deal="Deal",
+            prix=100,
+            categorie=self.categorie_produit,
+            etablissement=self.etab,
+        )
+        self.assertEqual(get_backend().rechercher("chocolat"), [dans_nom.id, dans_description.id])
+
+    def test_shop_recherche(self):
+        self.produit.status = False
+        self.produit.save()
+        visible = Produit.objects.create(
+            nom="Produit visible",
+            description="Description produit",
+            description_deal="Deal",
+            prix=100,
+            categorie=self.categorie_produit,
+            etablissement=self.etab,
+        )
+        response = self.client.get(reverse('shop'), {'q': 'produit'})
+        self.assertEqual([p.id for p in response.context['produits']], [visible.id])
+
     # === Tests avec authentification / messages / redirection ===
     def test_checkout_redirect_if_not_logged(self):
         response = self.client.get(reverse('checkout'))
@@ -138,7 +221,50 @@ class ShopTests(TestCase):
         response = self.client.get(reverse('paiement_success'))
         self.assertEqual(response.status_code, 200)
 
-    
+    # === Pagination du catalogue ===
+    def creer_produits(self, nombre):
+        for i in range(nombre):
+            Produit.objects.create(
+                nom=f"Produit {i}",
+                description="Description produit",
+                description_deal="Deal",
+                prix=100 + i,
+                categorie=self.categorie_produit,
+                etablissement=self.etab,
+            )
+
+    @override_settings(SHOP_PAGE_SIZE=2)
+    def test_shop_pagination_par_curseur(self):
+        self.creer_produits(3)  # 4 produits avec celui du setUp
+        attendus = list(Produit.objects.order_by('-date_add', '-id').values_list('id', flat=True))
+
+        response = self.client.get(reverse('shop'))
+        page_1 = [p.id for p in response.context['produits']]
+        curseur = response.context['curseur_suivant']
+        self.assertEqual(page_1, attendus[:2])
+        self.assertIsNotNone(curseur)
+
+        response = self.client.get(reverse('shop'), {'apres': curseur})
+        page_2 = [p.id for p in response.context['produits']]
+        self.assertEqual(page_2, attendus[2:])
+        self.assertIsNone(response.context['curseur_suivant'])
+
+    def test_shop_curseur_invalide(self):
+        response = self.client.get(reverse('shop'), {'apres': 'invalide'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['produits']), 1)
+
+    def test_shop_json(self):
+        self.creer_produits(2)
+        response = self.client.get(reverse('shop_json'), {'taille': 2})
+        data = response.json()
+        self.assertEqual(len(data['produits']), 2)
+        self.assertIsNotNone(data['suivant'])
+
+        data = self.client.get(reverse('shop_json'), {'taille': 2, 'apres': data['suivant']}).json()
+        self.assertEqual(len(data['produits']), 1)
+        self.assertIsNone(data['suivant'])
+
 
     def test_post_paiement_invalid_data(self):
         request = self.factory.post(
@@ -300,16 +426,16 @@ class TestsFonctionnel:
         images = soup.find_all("img")
         assert len(images) > 0
 
-        # Vérifie que l'image du produit est présente (si le template l'affiche)
-        # Si l'URL complète n'est pas dans src, adapte selon ton template
-        assert any(self.produit.image.url in img.get("src", "") for img in images)
+        # Vérifie que l'image du produit est présente, en dérivé redimensionné (website.images)
+        derive = url_derive(self.produit.image.name, "moyenne", "jpg")
+        assert any(derive in img.get("src", "") for img in images)
 
     def test_shop_images_produits_affichees(self, client):
         response = client.get(reverse("shop"))
         assert response.status_code == 200
         html = response.content.decode()
         assert "<img" in html
-        assert self.produit.image.url in html
+        assert url_derive(self.produit.image.name, "moyenne", "jpg") in html
 
     def test_shop_produits_ordonne_par_date(self, client):
         # Crée un deuxième produit plus récent
@@ -483,3 +609,154 @@ class TestsFonctionnel:
     def test_parametre_anonyme(self, client):
         response = client.get(reverse("etablissement-parametre"))
         assert response.status_code == 302
+
+
+@pytest.mark.django_db
+class TestStatistiquesVendeur:
+    """Les compteurs du tableau de bord suivent les commandes sans relire l'historique."""
+
+    @pytest.fixture(autouse=True)
+    def setup_data(self, db):
+        categorie_etab = CategorieEtablissement.objects.create(nom="Restaurant", description="Catégorie test")
+        self.vendeur = User.objects.create_user(username="vendeur", password="password123")
+        self.etablissement = Etablissement.objects.create(
+            user=self.vendeur, nom="Boutique Vendeur", description="Test", categorie=categorie_etab,
+            logo="logo.jpg", couverture="couv.jpg", adresse="123 Rue Test", contact_1="0000000000", nom_du_responsable="Dupont", prenoms_duresponsable="Jean",
+        )
+        self.produit = Produit.objects.create(
+            nom="Laptop", slug="laptop", description="Un super laptop", prix=1000, etablissement=self.etablissement,
+            categorie=CategorieProduit.objects.create(nom="Électronique", description="Test", categorie=categorie_etab),
+        )
+        self.customer = Customer.objects.create(
+            user=User.objects.create_user(username="client", password="password123"), adresse="Rue", contact_1="0102030405",
+        )
+
+    def commander(self, quantite, transaction_id):
+        from customer.models import Panier, ProduitPanier
+        from customer.utils import passer_commande
+
+        panier = Panier.objects.create(customer=self.customer)
+        ProduitPanier.objects.create(panier=panier, produit=self.produit, quantite=quantite)
+        return passer_commande(panier.id, self.customer, transaction_id)[0]
+
+    def test_compteurs_incrementes(self):
+        from shop.statistiques import tableau_de_bord
+
+        self.commander(2, "TX-1")
+        self.commander(1, "TX-2")
+
+        indicateurs = tableau_de_bord(self.etablissement)
+        assert indicateurs == {
+            "total_articles": 1,
+            "total_commandes": 2,
+            "chiffre_affaires": 3000,
+            "commandes_aujourdhui": 2,
+            "chiffre_affaires_aujourdhui": 3000,
+        }
+
+    def test_recalcul_identique(self):
+        from shop.statistiques import recalculer, tableau_de_bord
+
+        self.commander(2, "TX-1")
+        self.commander(3, "TX-2")
+        avant = tableau_de_bord(self.etablissement)
+
+        recalculer()
+        assert tableau_de_bord(self.etablissement) == avant
+
+    def test_dashboard_requetes_constantes(self, client, django_assert_max_num_queries):
+        client.force_login(self.vendeur)
+        for i in range(5):
+            self.commander(1, f"TX-{i}")
+
+        with django_assert_max_num_queries(13):
+            response = client.get(reverse("dashboard"))
+        assert response.context["total_commandes"] == 5
+
+    def test_ventes_par_produit(self):
+        from django.utils import timezone
+        from shop.statistiques import meilleures_ventes, remplir_ventes, ventes_par_jour
+
+        self.commander(2, "TX-1")
+        self.commander(3, "TX-2")
+        assert meilleures_ventes(self.etablissement) == [
+            {"produit_id": self.produit.id, "produit__nom": "Laptop", "quantite": 5, "chiffre_affaires": 5000},
+        ]
+        aujourdhui = timezone.localdate()
+        attendu = [(aujourdhui, 5, 5000)]
+        assert ventes_par_jour(self.etablissement, aujourdhui, aujourdhui) == attendu
+
+        # La reprise par paquets d'une commande retrouve le cumul incrémental
+        assert sum(remplir_ventes(taille=1)) == 2
+        assert ventes_par_jour(self.etablissement, aujourdhui, aujourdhui) == attendu
+        assert self.etablissement.ventes_jour.get().nb_commandes == 2
+
+        # Commande passée pendant la reprise : comptée une seule fois, par enregistrer_commande
+        reprise = remplir_ventes(taille=1)
+        assert next(reprise) == 1
+        self.commander(4, "TX-3")
+        assert sum(reprise) == 1
+        assert ventes_par_jour(self.etablissement, aujourdhui, aujourdhui) == [(aujourdhui, 9, 9000)]
+
+    def test_commandes_du_vendeur(self, client):
+        commande = self.commander(1, "TX-1")
+        autre = User.objects.create_user(username="autre", password="password123")
+        Etablissement.objects.create(
+            user=autre, nom="Autre", description="Test", categorie=self.etablissement.categorie,
+            logo="logo.jpg", couverture="couv.jpg", adresse="1 Rue", contact_1="0000000001", nom_du_responsable="Durand", prenoms_duresponsable="Paul",
+        )
+
+        client.force_login(self.vendeur)
+        response = client.get(reverse("commande-reçu"), {"produit": "lap"})
+        assert [part.commande_id for part in response.context["commandes"]] == [commande.id]
+        assert client.get(reverse("commande-reçu-detail", args=[commande.id])).status_code == 200
+
+        # Un autre vendeur ne voit pas la commande
+        client.force_login(autre)
+        assert list(client.get(reverse("commande-reçu")).context["commandes"]) == []
+        assert client.get(reverse("commande-reçu-detail", args=[commande.id])).status_code == 404
+
+    def test_boite_de_commandes(self, client, settings):
+        from django.utils import timezone
+
+        settings.SHOP_INBOX_PAGE_SIZE = 2
+        commandes = [self.commander(1, f"TX-{i}") for i in range(3)]
+        client.force_login(self.vendeur)
+
+        # Pagination par clé : la page suivante reprend après la dernière commande vue
+        premiere = client.get(reverse("commande-reçu"))
+        assert [p.commande_id for p in premiere.context["commandes"]] == [commandes[2].id, commandes[1].id]
+        seconde = client.get(reverse("commande-reçu"), {"apres": premiere.context["curseur_suivant"]})
+        assert [p.commande_id for p in seconde.context["commandes"]] == [commandes[0].id]
+        assert seconde.context["curseur_suivant"] is None
+        assert premiere.context["nombre_commandes"] == 3
+
+        # Recherche sans accents ni casse, date de fin incluse
+        self.customer.user.first_name = "Aïcha"
+        self.customer.user.save()
+        commande = self.commander(2, "TX-3")
+        aujourdhui = timezone.localdate().isoformat()
+        response = client.get(reverse("commande-reçu"), {"client": "AICHA", "produit": "LAPTOP", "date_max": aujourdhui})
+        assert [p.commande_id for p in response.context["commandes"]] == [commande.id]
+        assert response.context["nombre_commandes"] == 1
+
+    def test_nombre_commandes_en_cache(self, django_assert_num_queries):
+        from shop.commandes import nombre_commandes
+
+        self.commander(1, "TX-1")
+        filtres = {"status": "payée"}
+        assert nombre_commandes(self.etablissement, filtres) == 1
+        with django_assert_num_queries(1):
+            assert nombre_commandes(self.etablissement, filtres) == 1
+
+        # Une nouvelle commande change la clé : le compte est refait
+        self.commander(1, "TX-2")
+        assert nombre_commandes(self.etablissement, filtres) == 2
+
+        # Un changement de statut aussi
+        commande = self.commander(1, "TX-3")
+        assert nombre_commandes(self.etablissement, filtres) == 3
+        commande.status = False
+        commande.save()
+        assert nombre_commandes(self.etablissement, filtres) == 2
+        assert nombre_commandes(self.etablissement, {"status": "attente"}) == 1
@@ -4,6 +4,7 @@ from . import views
 
 urlpatterns = [
     path('', views.shop, name="shop"),
+    path('api/produits', views.shop_json, name="shop_json"),
     path('produit/<str:slug>', views.product_detail, name="product_detail"),
     path('cart', views.cart, name="cart"),
     path('checkout', views.checkout, name="checkout"),
@@ -17,6 +18,7 @@ urlpatterns = [
     path('modifier-article/<int:article_id>/', views.modifier_article, name='modifier'),
     path('supprimer-article/<int:article_id>/', views.supprimer_article, name='supprimer-article'),
     path('commande-reçu/', views.commande_reçu, name='commande-reçu'),
+    path('commande-reçu/export', views.export_recus, name='export_recus'),
     path('commande-reçu-detail/<int:commande_id>/', views.commande_reçu_detail, name='commande-reçu-detail'),
     path('etablissement-parametre/', views.etablissement_parametre, name='etablissement-parametre'),
 ]
@@ -1,9 +1,11 @@
 from django.shortcuts import redirect, render,  get_object_or_404
+from django.urls import reverse
 from . import models
 from customer import models as customer_models
 from django.contrib.auth.decorators import login_required
 import json
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
+from django.conf import settings
 from django.views.decorators.csrf import csrf_exempt
 from cinetpay_sdk.s_d_k import Cinetpay
 from cities_light.models import City
@@ -11,23 +13,81 @@ from cities_light.models import City
 from django.contrib import messages
 from .models import Produit, Favorite, Etablissement, CategorieProduit
 from customer.models import Commande
-
-from django.core.paginator import Paginator
+from customer.utils import passer_commande
+from client.taches import mettre_en_file
+from client.export import recus_zip
+
+from .pagination import page_par_cle, page_produits, taille_page
+from .search import get_backend, rechercher_produits
+from .commandes import boite_commandes, lire_filtres, nombre_commandes
+from .statistiques import meilleures_ventes, tableau_de_bord
 from django.utils import timezone
 
 
+def page_catalogue(request, produits):
+    """Applique le filtre de prix (prix effectif, calculé en SQL) puis la pagination."""
+    produits = produits.avec_promotion()
+    for param, lookup in (('prix_min', 'effective_price__gte'), ('prix_max', 'effective_price__lte')):
+        try:
+            produits = produits.filter(**{lookup: float(request.GET[param])})
+        except (KeyError, ValueError):
+            pass
+    return page_produits(produits, request.GET.get('apres'), taille_page(request))
+
+
+def page_recherche(request, requete):
+    # Résultats classés par pertinence : le curseur est le rang du premier résultat
+    try:
+        decalage = max(0, int(request.GET.get('apres', 0)))
+    except ValueError:
+        decalage = 0
+    return rechercher_produits(requete, decalage, taille_page(request), status=True)
+
+
 # Create your views here.
 def shop(request):
-    produits = models.Produit.objects.filter(status=True)
+    requete = request.GET.get('q', '').strip()
+    if requete:
+        produits, suivant = page_recherche(request, requete)
+    else:
+        produits, suivant = page_catalogue(request, models.Produit.objects.filter(status=True))
     datas = {
-        'produits' : produits
+        'produits' : produits,
+        'curseur_suivant': suivant,
+        'requete': requete,
     }
     return render(request, 'shop.html', datas)
 
 
+def shop_json(request):
+    # Défilement infini : même pagination par curseur que la page /deals/
+    requete = request.GET.get('q', '').strip()
+    if requete:
+        produits, suivant = page_recherche(request, requete)
+    else:
+        produits, suivant = page_catalogue(request, models.Produit.objects.filter(status=True))
+    data = {
+        'produits': [
+            {
+                'id': produit.id,
+                'nom': produit.nom,
+                'url': reverse('product_detail', args=[produit.slug]),
+                'image': produit.image.url,
+                'prix': produit.prix,
+                'prix_promotionnel': produit.prix_promotionnel,
+                'prix_effectif': produit.effective_price,
+                'promotion': produit.is_on_promo,
+            }
+            for produit in produits
+        ],
+        'suivant': suivant,
+    }
+    return JsonResponse(data, safe=False)
+
+
 def product_detail(request, slug):
     produit = get_object_or_404(Produit, slug=slug)
-    produits = Produit.objects.filter(categorie=produit.categorie).exclude(id=produit.id)[:3]
+    produits = Produit.objects.filter(categorie=produit.categorie).exclude(id=produit.id).avec_promotion()[:3]
 
     
     is_favorited = False
@@ -87,16 +147,18 @@ def single(request, slug):
     try:
         try:
             categorie = models.CategorieProduit.objects.get(slug=slug)
-            produits = categorie.produit.all()
+            produits = categorie.produit
         except:
             categorie = models.CategorieEtablissement.objects.get(slug=slug)
-            produits = categorie.produit_etab.all()
+            produits = categorie.produit_etab
     except:
         return redirect('shop')
 
+    produits, suivant = page_catalogue(request, produits)
     datas = {
         'produits' : produits,
-        'categorie' : categorie
+        'categorie' : categorie,
+        'curseur_suivant': suivant,
     }
     return render(request, 'shop.html', datas)
 
@@ -114,47 +176,19 @@ def post_paiement_details(request):
     isSuccess = False
 
     _ = isSuccess
-    if user and panier is not None and transaction_id is not None and notify_url is not None and return_url is not None :
-        try:
-            panier = customer_models.Panier.objects.get(id=panier, customer=user.customer)
-        except:
-            panier = None
-
-        if panier:
-            data = {
-                'amount': 100,
-                'currency': "XOF",
-                'transaction_id': transaction_id,
-                'description': "TRANSACTION DESCRIPTION",
-                'return_url': notify_url,
-                'notify_url': return_url,
-                'customer_name': user.first_name,
-                'customer_surname': user.last_name,
-            }
-
-            try:
-
-                commande = customer_models.Commande()
-                commande.customer = request.user.customer
-                commande.payment_url = 'payment_url'
-                commande.id_paiment = transaction_id
-                commande.transaction_id = transaction_id
-                commande.api_response_id = 'api_response_id'
-                commande.payment_token = 'payment_token'
-                commande.prix_total = panier.total_with_coupon
-                commande.save()
-
-                for i in customer_models.ProduitPanier.objects.filter(panier=panier):
-                    i.panier = None
-                    i.commande = commande
-                    i.save()
-                isSuccess = True
-                message = "Commande validée"
-                panier.delete()
-
-            except Exception as _:
-                isSuccess = False
-                message = "Une erreur s'est produite, merci de rééssayer"
+    try:
+        panier = int(panier)
+    except (TypeError, ValueError):
+        panier = None
+
+    if user.is_authenticated and hasattr(user, 'customer') and panier is not None and transaction_id is not None and notify_url is not None and return_url is not None :
+        commande, creee = passer_commande(panier, user.customer, transaction_id)
+        if creee:
+            # Le reçu est préparé en arrière-plan pendant que le client est redirigé
+            mettre_en_file(commande)
+        if commande is not None:
+            isSuccess = True
+            message = "Commande validée"
         else:
             isSuccess = False
             message = "Une erreur s'est produite"
@@ -174,32 +208,22 @@ def dashboard(request):
     
     etablissement = get_object_or_404(Etablissement, user=request.user)
 
-    
-    total_articles = Produit.objects.filter(etablissement=etablissement).count()
-
-    
-    today = timezone.now().date()
-    commandes_aujourdhui = Commande.objects.filter(
-        produit_commande__produit__etablissement=etablissement,
-        date_add__date=today
-    ).distinct().count()
-
-    
-    total_commandes = Commande.objects.filter(produit_commande__produit__etablissement=etablissement).distinct().count()
+    # Compteurs tenus à jour à chaque commande : une seule requête
+    indicateurs = tableau_de_bord(etablissement)
+    meilleurs_produits = meilleures_ventes(etablissement)
 
     
     derniers_articles = Produit.objects.filter(etablissement=etablissement).order_by("-date_add")[:5]
 
     
-    dernieres_commandes = Commande.objects.filter(produit_commande__produit__etablissement=etablissement).distinct().order_by("-date_add")[:5]
+    dernieres_commandes = [part.commande for part in boite_commandes(etablissement, {}).select_related("commande")[:5]]
 
     context = {
         "etablissement": etablissement,
-        "total_articles": total_articles,
-        "commandes_aujourdhui": commandes_aujourdhui,
-        "total_commandes": total_commandes,
+        **indicateurs,
         "derniers_articles": derniers_articles,
         "dernieres_commandes": dernieres_commandes,
+        "meilleurs_produits": meilleurs_produits,
     }
 
     return render(request, "dashboard.html", context)
@@ -254,7 +278,8 @@ def article_detail(request):
     category_filter = request.GET.get("category", "")
 
     if search_query:
-        articles = articles.filter(nom__icontains=search_query)
+        ids = get_backend().rechercher(search_query, etablissement_id=etablissement.id)
+        articles = articles.filter(id__in=ids)
 
     if category_filter:
         articles = articles.filter(categorie__nom=category_filter)
@@ -321,44 +346,40 @@ def supprimer_article(request, article_id):
 @login_required
 def commande_reçu(request):
     etablissement = get_object_or_404(Etablissement, user=request.user)
-    commandes_list = Commande.objects.filter(produit_commande__produit__etablissement=etablissement).distinct().order_by('-date_add')
+    filtres = lire_filtres(request.GET)
+    boite = boite_commandes(etablissement, filtres).select_related('commande__customer__user')
 
-    # 📌 Filtrage par client
-    client = request.GET.get("client")
-    if client:
-        commandes_list = commandes_list.filter(customer__user__first_name__icontains=client).order_by('-date_add')
+    # Pagination par clé : pas d'OFFSET ni de COUNT par page
+    commandes, suivant = page_par_cle(boite, request.GET.get("apres"), getattr(settings, "SHOP_INBOX_PAGE_SIZE", 25))
 
-    # 📌 Filtrage par produit
-    produit = request.GET.get("produit")
-    if produit:
-        commandes_list = commandes_list.filter(produit_commande__produit__nom__icontains=produit).order_by('-date_add')
-
-    # 📌 Filtrage par statut
-    status = request.GET.get("status")
-    if status == "payée":
-        commandes_list = commandes_list.filter(status=True).order_by('-date_add')
-    elif status == "attente":
-        commandes_list = commandes_list.filter(status=False).order_by('-date_add')
+    return render(request, "commande-reçu.html", {
+        "commandes": commandes,
+        "curseur_suivant": suivant,
+        "nombre_commandes": nombre_commandes(etablissement, filtres),
+        "etablissement": etablissement,
+    })
 
-    # 📌 Filtrage par date
-    date_min = request.GET.get("date_min")
-    date_max = request.GET.get("date_max")
-    if date_min:
-        commandes_list = commandes_list.filter(date_add__gte=date_min).order_by('-date_add')
-    if date_max:
-        commandes_list = commandes_list.filter(date_add__lte=date_max).order_by('-date_add')
 
-    paginator = Paginator(commandes_list, 25)
-    page_number = request.GET.get("page")
-    commandes = paginator.get_page(page_number)
+@login_required
+def export_recus(request):
+    """Tous les reçus des commandes filtrées, en une archive ZIP envoyée au fil de l'eau."""
+    etablissement = get_object_or_404(Etablissement, user=request.user)
+    limite = getattr(settings, "RECEIPT_EXPORT_MAX", 500)
+    boite = boite_commandes(etablissement, lire_filtres(request.GET))
+    ids = list(boite.values_list('commande_id', flat=True)[:limite])
+    commandes = Commande.objects.filter(id__in=ids).order_by('-date_add').prefetch_related('produit_commande')
 
-    return render(request, "commande-reçu.html", {"commandes": commandes, "etablissement": etablissement})
+    response = StreamingHttpResponse(recus_zip(commandes.iterator(chunk_size=100)), content_type="application/zip")
+    nom = f"recus_{etablissement.id}_{timezone.now():%Y%m%d}.zip"
+    response["Content-Disposition"] = f'attachment; filename="{nom}"'
+    return response
 
 
 @login_required
 def commande_reçu_detail(request, commande_id):
     etablissement = get_object_or_404(Etablissement, user=request.user)
-    commande = get_object_or_404(Commande, id=commande_id, produit_commande__produit__etablissement=etablissement)
+    # distinct : une commande avec plusieurs lignes du vendeur reste un seul résultat
+    commande = get_object_or_404(Commande.objects.distinct(), id=commande_id, produit_commande__etablissement=etablissement)
 
     return render(request, "commande-reçu-detail.html", {"commande": commande,"etablissement": etablissement,})
 
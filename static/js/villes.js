@@ -0,0 +1,17 @@
+// Remplit les <select data-villes="url"> à partir de la liste JSON des villes (mise en cache par le navigateur)
+document.querySelectorAll('select[data-villes]').forEach(function (select) {
+    fetch(select.dataset.villes)
+        .then(function (response) { return response.json(); })
+        .then(function (data) {
+            var selected = select.value;
+            Array.from(select.options).forEach(function (option) {
+                if (!option.disabled) {
+                    option.remove();
+                }
+            });
+            data.villes.forEach(function (ville) {
+                var actif = String(ville[0]) === selected;
+                select.add(new Option(ville[1], ville[0], actif, actif));
+            });
+        });
+});
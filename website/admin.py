@@ -229,6 +229,35 @@ class PartenaireAdmin(admin.ModelAdmin):
     )
 
 
+class TacheImageAdmin(admin.ModelAdmin):
+
+    list_display = (
+        'id',
+        'fichier',
+        'etat',
+        'tentatives',
+        'date_add',
+        'date_debut',
+        'date_fin',
+    )
+    list_filter = (
+        'etat',
+        'date_add',
+    )
+    search_fields = ('fichier',)
+
+
+class FichierMediaAdmin(admin.ModelAdmin):
+
+    list_display = (
+        'id',
+        'nom',
+        'references',
+        'date_add',
+    )
+    search_fields = ('nom',)
+
+
 def _register(model, admin_class):
     admin.site.register(model, admin_class)
 
@@ -240,4 +269,6 @@ _register(models.About, AboutAdmin)
 _register(models.WhyChooseUs, WhyChooseUsAdmin)
 _register(models.Galerie, GalerieAdmin)
 _register(models.Horaire, HoraireAdmin)
-_register(models.Partenaire, PartenaireAdmin)
\ No newline at end of file
+_register(models.Partenaire, PartenaireAdmin)
+_register(models.TacheImage, TacheImageAdmin)
+_register(models.FichierMedia, FichierMediaAdmin)
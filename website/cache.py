@@ -0,0 +1,42 @@
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+VERSION_KEY = 'site:version'
+
+_ABSENT = object()
+
+
+def _cache():
+    return caches[getattr(settings, 'SITE_CACHE_ALIAS', 'default')]
+
+
+def _version(cache):
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Horodatage : ne réutilise jamais des clés d'une version précédente
+        cache.add(VERSION_KEY, int(time.time()), None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def get_or_set(nom, calcul):
+    """Valeur mise en cache jusqu'à la prochaine invalidation (ou SITE_CACHE_TIMEOUT)."""
+    cache = _cache()
+    cle = 'site:{}:{}'.format(_version(cache), nom)
+    valeur = cache.get(cle, _ABSENT)
+    if valeur is _ABSENT:
+        valeur = calcul()
+        cache.set(cle, valeur, getattr(settings, 'SITE_CACHE_TIMEOUT', 300))
+    return valeur
+
+
+def invalider(**kwargs):
+    """Change de version : toutes les entrées du site sont recalculées."""
+    cache = _cache()
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, int(time.time()), None)
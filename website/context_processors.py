@@ -1,68 +1,52 @@
 from shop import models
 from . import models as config_models
-from customer import models as customer_models
-from django.contrib.sessions.models import Session
-from cities_light.models import City
+from . import cache as site_cache
+from customer.utils import get_panier
+from django.utils.functional import SimpleLazyObject
+import logging
 
 
-def categories(request):
-    cat = models.CategorieEtablissement.objects.filter(status=True)
+logger = logging.getLogger(__name__)
 
-    return {'cat':cat}
 
+def categories(request):
+    cat = site_cache.get_or_set('categories', lambda: list(
+        models.CategorieEtablissement.objects.filter(status=True).prefetch_related('categorie_produits')
+    ))
 
-def site_infos(request):
-    try:
-        infos = config_models.SiteInfo.objects.latest('date_add')
-    except:
-        infos = None
-    return {'infos':infos}
+    return {'cat':cat}
 
 
-def cities(request):
+def _derniere_info():
+    return config_models.SiteInfo.objects.order_by('-date_add').first()
 
-    cities = City.objects.all()
 
-    return {'cities': cities}
+def site_infos(request):
+    infos = site_cache.get_or_set('infos', _derniere_info)
+    return {'infos':infos}
 
 
 def galeries(request):
-    galerie = config_models.Galerie.objects.filter(status=True)[:6]
+    galerie = site_cache.get_or_set('galeries', lambda: list(config_models.Galerie.objects.filter(status=True)[:6]))
 
     return {'galeries':galerie}
 
 
 def horaires(request):
-    horaire = config_models.Horaire.objects.filter(status=True)
+    horaire = site_cache.get_or_set('horaires', lambda: list(config_models.Horaire.objects.filter(status=True)))
 
     return {'horaires':horaire}
 
 
-def cart(request):
-    carts = ""
+def _resolve_cart(request):
+    # Une erreur sur le mini-panier ne doit pas casser le rendu de toutes les pages
     try:
-        if not request.session.exists(request.session.session_key):
-            request.session.create()
-        session_id = Session.objects.get(session_key=request.session.session_key)
-        if request.user.is_authenticated:
-            try:
-                customer = customer_models.Customer.objects.get(user=request.user)
-                carts = customer_models.Panier.objects.get(customer=customer, session_id=session_id)
-            except Exception as e:
-
-                customer = customer_models.Customer.objects.get(user=request.user)
-                carts = customer_models.Panier()
-                carts.session_id = session_id
-                carts.customer = customer
-                carts.save()
-        else:
-            try:
-                carts = customer_models.Panier.objects.get(session_id=session_id)
-            except Exception as e:
-
-                carts = customer_models.Panier()
-                carts.session_id = session_id
-                carts.save()
-    except:
-        pass
-    return {'cart':carts}
\ No newline at end of file
+        return get_panier(request)
+    except Exception:
+        logger.exception("Impossible de résoudre le panier de la session")
+        return None
+
+
+def cart(request):
+    # Le panier n'est résolu que si le template accède réellement à `cart`
+    return {'cart': SimpleLazyObject(lambda: _resolve_cart(request))}
@@ -0,0 +1,200 @@
+import hashlib
+import logging
+import os
+import tempfile
+from io import BytesIO
+from urllib.parse import quote
+
+from django.core.files.storage import default_storage
+from django.db import models
+from django.urls import reverse
+
+from .stockage import est_contenu, nom_contenu
+
+
+logger = logging.getLogger(__name__)
+
+# Largeur maximale (px) de chaque dérivé ; l'original n'est jamais agrandi
+TAILLES = {
+    "miniature": 160,
+    "moyenne": 480,
+    "grande": 1200,
+}
+
+# Du plus compact au plus compatible : le JPEG est le repli de <img>
+FORMATS = {
+    "avif": ("AVIF", "image/avif", {"quality": 50}),
+    "webp": ("WEBP", "image/webp", {"quality": 75, "method": 4}),
+    "jpg": ("JPEG", "image/jpeg", {"quality": 80, "optimize": True, "progressive": True}),
+}
+
+# Réencodage des originaux téléversés, selon leur format
+ORIGINAUX = {
+    "JPEG": {"quality": 85, "optimize": True, "progressive": True},
+    "PNG": {"optimize": True},
+    "WEBP": {"quality": 85},
+}
+
+DOSSIER = "derives"
+
+# Affiché à la place d'une image dont le traitement n'est pas terminé
+ATTENTE = "data:image/svg+xml," + quote(
+    '<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 4 3"><rect width="4" height="3" fill="#eee"/></svg>'
+)
+
+# Dérivés dont on sait qu'ils existent : évite un stat() par image et par rendu
+_existants = set()
+
+
+def nom_derive(nom, taille, format):
+    """media/derives/<taille>/<chemin de l'original sans extension>.<format>"""
+    return f"{DOSSIER}/{taille}/{os.path.splitext(nom)[0]}.{format}"
+
+
+def existe(derive):
+    if derive in _existants or default_storage.exists(derive):
+        _existants.add(derive)
+        return True
+    return False
+
+
+# ouvrir, encoder, optimiser et traiter_fichier n'utilisent ni les réglages ni
+# la base : elles tournent aussi dans les processus fils de `manage.py traiter_images`.
+
+def ouvrir(source):
+    """Image décodée (chemin ou fichier), orientée d'après son EXIF. Retourne (image, format d'origine)."""
+    from PIL import Image, ImageOps
+
+    image = Image.open(source)
+    image.load()
+    return ImageOps.exif_transpose(image), image.format
+
+
+def encoder(original, largeur, format):
+    """Octets du dérivé de `largeur` px au plus, sans métadonnées."""
+    from PIL import Image
+
+    image = original.copy()
+    image.thumbnail((largeur, largeur * 4), Image.LANCZOS)
+    pil_format, _, options = FORMATS[format]
+    if pil_format == "JPEG" and image.mode != "RGB":
+        # Pas de transparence en JPEG : fond blanc
+        fond = Image.new("RGB", image.size, (255, 255, 255))
+        image = image.convert("RGBA")
+        fond.paste(image, mask=image.getchannel("A"))
+        image = fond
+    elif image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA")
+
+    sortie = BytesIO()
+    image.save(sortie, pil_format, **options)
+    return sortie.getvalue()
+
+
+def _ecrire(chemin, data):
+    # Fichier temporaire puis os.replace : jamais de fichier à moitié écrit servi au client
+    os.makedirs(os.path.dirname(chemin), exist_ok=True)
+    descripteur, temporaire = tempfile.mkstemp(dir=os.path.dirname(chemin), suffix=".tmp")
+    with os.fdopen(descripteur, "wb") as f:
+        f.write(data)
+    os.replace(temporaire, chemin)
+
+
+def optimiser(chemin, dimension_max):
+    """Réduit l'original à `dimension_max` px, retire ses métadonnées et le recompresse.
+
+    Rien n'est écrit. Retourne (image décodée, octets réencodés), ces derniers
+    à None quand l'original n'a été ni réduit, ni dépouillé de métadonnées,
+    ni allégé : il est alors gardé tel quel.
+    """
+    from PIL import Image
+
+    avant = os.path.getsize(chemin)
+    image, format_origine = ouvrir(chemin)
+    if format_origine not in ORIGINAUX:
+        return image, None
+    with Image.open(chemin) as brute:
+        metadonnees = bool(brute.info.get("exif") or brute.info.get("xmp") or len(brute.getexif()))
+
+    reduite = max(image.size) > dimension_max
+    if reduite:
+        image.thumbnail((dimension_max, dimension_max), Image.LANCZOS)
+    enregistree = image.convert("RGB") if format_origine == "JPEG" and image.mode != "RGB" else image
+    sortie = BytesIO()
+    enregistree.save(sortie, format_origine, **ORIGINAUX[format_origine])
+    if reduite or metadonnees or sortie.tell() < avant:
+        return image, sortie.getvalue()
+    return image, None
+
+
+def traiter_fichier(racine, nom, dimension_max):
+    """Optimise l'original `nom` (relatif à `racine`) puis écrit ses dérivés manquants.
+
+    Un fichier du stockage par empreinte n'est jamais réécrit : la version
+    optimisée est enregistrée sous sa propre empreinte, et les dérivés sont
+    tirés de ce nouveau nom. Retourne (nom final, octets avant, après).
+    """
+    chemin = os.path.join(racine, nom)
+    avant = os.path.getsize(chemin)
+    image, optimise = optimiser(chemin, dimension_max)
+    if optimise is not None:
+        if est_contenu(nom):
+            nom = nom_contenu(hashlib.sha256(optimise).hexdigest(), nom)
+            chemin = os.path.join(racine, nom)
+        if not est_contenu(nom) or not os.path.exists(chemin):
+            _ecrire(chemin, optimise)
+
+    for taille, largeur in TAILLES.items():
+        for format in FORMATS:
+            chemin_derive = os.path.join(racine, nom_derive(nom, taille, format))
+            if not os.path.exists(chemin_derive):
+                _ecrire(chemin_derive, encoder(image, largeur, format))
+    return nom, avant, os.path.getsize(chemin)
+
+
+def generer(nom, taille, format, original=None):
+    """Écrit le dérivé `taille`/`format` de l'image `nom` s'il n'existe pas encore ; retourne son nom."""
+    derive = nom_derive(nom, taille, format)
+    if existe(derive):
+        return derive
+
+    if original is None:
+        with default_storage.open(nom, "rb") as f:
+            original, _ = ouvrir(f)
+
+    # Écrit à son nom exact (le stockage par défaut renommerait d'après le contenu) ;
+    # deux requêtes simultanées écrivent le même fichier
+    _ecrire(default_storage.path(derive), encoder(original, TAILLES[taille], format))
+    _existants.add(derive)
+    return derive
+
+
+def generer_tous(nom):
+    """Tous les dérivés manquants d'une image, en ne décodant l'original qu'une fois."""
+    manquants = [(t, f) for t in TAILLES for f in FORMATS if not existe(nom_derive(nom, t, f))]
+    if not manquants:
+        return []
+    with default_storage.open(nom, "rb") as fichier:
+        original, _ = ouvrir(fichier)
+    return [generer(nom, taille, format, original) for taille, format in manquants]
+
+
+def url_derive(nom, taille, format):
+    """URL du dérivé sur disque, ou de la vue qui le génère à la première demande."""
+    derive = nom_derive(nom, taille, format)
+    if existe(derive):
+        return default_storage.url(derive)
+    return reverse("image_derivee", args=[taille, format, nom])
+
+
+def sources(nom):
+    """{format: srcset} de toutes les tailles, pour les <source> d'un <picture>."""
+    return {
+        format: ", ".join(f"{url_derive(nom, taille, format)} {largeur}w" for taille, largeur in TAILLES.items())
+        for format in FORMATS
+    }
+
+
+def champs_images(modele):
+    """Noms (attname) des ImageField d'un modèle."""
+    return [champ.attname for champ in modele._meta.fields if isinstance(champ, models.ImageField)]
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import models
+
+from shop.models import Etablissement, Produit
+from website.images import generer_tous
+from website.models import Banniere
+
+
+class Command(BaseCommand):
+    help = "Génère les dérivés redimensionnés (AVIF, WebP, JPEG) des images déjà téléversées"
+
+    def handle(self, *args, **options):
+        debut = time.perf_counter()
+        noms = set()
+        for model in (Produit, Etablissement, Banniere):
+            champs = [champ.attname for champ in model._meta.fields if isinstance(champ, models.ImageField)]
+            for valeurs in model.objects.values_list(*champs).iterator():
+                noms.update(nom for nom in valeurs if nom)
+
+        crees = erreurs = 0
+        for nom in sorted(noms):
+            try:
+                crees += len(generer_tous(nom))
+            except OSError as e:
+                erreurs += 1
+                self.stderr.write(f"{nom} : {e}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(noms)} image(s), {crees} dérivé(s) créé(s), {erreurs} erreur(s) en {time.perf_counter() - debut:.1f} s."
+        ))
@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from website.stockage import nettoyer_medias
+
+
+def _mo(octets):
+    return f"{octets / 1024 / 1024:.1f} Mo"
+
+
+class Command(BaseCommand):
+    help = "Supprime de MEDIA_ROOT les fichiers qu'aucun FileField / ImageField ne désigne plus"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Liste les orphelins sans rien supprimer")
+        parser.add_argument("--taille", type=int, default=1000, help="Nombre de fichiers par paquet")
+        parser.add_argument("--age", type=float, default=24, help="Épargne les fichiers modifiés depuis moins de N heures")
+
+    def handle(self, *args, **options):
+        supprimer = not options["dry_run"]
+        debut = time.perf_counter()
+        examines = octets = orphelins = recuperes = 0
+        for n, taille, paquet in nettoyer_medias(options["taille"], options["age"] * 3600, supprimer):
+            examines += n
+            octets += taille
+            for nom, poids in paquet:
+                orphelins += 1
+                recuperes += poids
+                if options["verbosity"] > 1 or not supprimer:
+                    self.stdout.write(f"{nom} ({_mo(poids)})")
+            self.stdout.write(f"{examines} fichier(s) examiné(s)…")
+
+        duree = time.perf_counter() - debut
+        self.stdout.write(
+            f"{examines} fichier(s), {_mo(octets)} examinés en {duree:.1f} s "
+            f"({examines / duree if duree else 0:.0f} fichiers/s, {_mo(octets / duree if duree else 0)}/s)."
+        )
+        verbe = "supprimé(s)" if supprimer else "à supprimer (--dry-run)"
+        self.stdout.write(self.style.SUCCESS(f"{orphelins} orphelin(s) {verbe}, {_mo(recuperes)} récupérés."))
@@ -0,0 +1,38 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from website.taches import traiter_file
+
+
+class Command(BaseCommand):
+    help = "Optimise les images téléversées et génère leurs dérivés (worker de la file TacheImage)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--une-fois", action="store_true", help="Vide la file puis s'arrête")
+        parser.add_argument("--intervalle", type=float, default=2.0, help="Pause (s) quand la file est vide")
+        parser.add_argument("--processus", type=int, default=None, help="Processus de traitement (IMAGE_WORKERS par défaut)")
+
+    def handle(self, *args, **options):
+        processus = options["processus"] or getattr(settings, "IMAGE_WORKERS", None) or os.cpu_count() or 1
+        while True:
+            # spawn : les fils n'héritent ni des connexions à la base ni des threads
+            with ProcessPoolExecutor(max_workers=processus, mp_context=multiprocessing.get_context("spawn")) as executor:
+                try:
+                    while True:
+                        debut = time.perf_counter()
+                        taches = traiter_file(executor, processus)
+                        if taches:
+                            self.stdout.write(f"{len(taches)} image(s) traitée(s) en {time.perf_counter() - debut:.1f} s.")
+                        elif options["une_fois"]:
+                            return
+                        else:
+                            time.sleep(options["intervalle"])
+                except BrokenProcessPool:
+                    # Un fils est mort (mémoire, image piégée) : les tâches seront reprises par un nouveau pool
+                    self.stderr.write("Pool de traitement interrompu, redémarrage.")
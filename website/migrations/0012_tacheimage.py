@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0011_siteinfo_icon'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TacheImage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fichier', models.CharField(max_length=255)),
+                ('etat', models.CharField(choices=[('attente', 'En attente'), ('en_cours', 'En cours'), ('terminee', 'Terminée'), ('echec', 'Échec')], default='attente', max_length=10)),
+                ('tentatives', models.PositiveSmallIntegerField(default=0)),
+                ('erreur', models.TextField(blank=True)),
+                ('date_add', models.DateTimeField(auto_now_add=True)),
+                ('date_debut', models.DateTimeField(blank=True, null=True)),
+                ('date_fin', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Tâche image',
+                'verbose_name_plural': 'Tâches images',
+                'indexes': [models.Index(fields=['etat', 'date_add'], name='tache_image_file_idx'), models.Index(fields=['fichier', 'etat'], name='tache_image_fichier_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0012_tacheimage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FichierMedia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nom', models.CharField(max_length=255, unique=True)),
+                ('references', models.IntegerField(default=0)),
+                ('date_add', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Fichier média',
+                'verbose_name_plural': 'Fichiers médias',
+            },
+        ),
+    ]
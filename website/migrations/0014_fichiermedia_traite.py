@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0013_fichiermedia'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fichiermedia',
+            name='traite',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -146,3 +146,54 @@ class Partenaire(models.Model):
     def __str__(self):
         return self.nom
 
+
+
+class TacheImage(models.Model):
+    """Traitement d'une image téléversée (website.images), exécuté par `manage.py traiter_images`."""
+
+    EN_ATTENTE = 'attente'
+    EN_COURS = 'en_cours'
+    TERMINEE = 'terminee'
+    ECHEC = 'echec'
+    ETATS = [
+        (EN_ATTENTE, 'En attente'),
+        (EN_COURS, 'En cours'),
+        (TERMINEE, 'Terminée'),
+        (ECHEC, 'Échec'),
+    ]
+
+    fichier = models.CharField(max_length=255)
+    etat = models.CharField(max_length=10, choices=ETATS, default=EN_ATTENTE)
+    tentatives = models.PositiveSmallIntegerField(default=0)
+    erreur = models.TextField(blank=True)
+    date_add = models.DateTimeField(auto_now_add=True)
+    date_debut = models.DateTimeField(null=True, blank=True)
+    date_fin = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Tâche image'
+        verbose_name_plural = 'Tâches images'
+        indexes = [
+            models.Index(fields=['etat', 'date_add'], name='tache_image_file_idx'),
+            models.Index(fields=['fichier', 'etat'], name='tache_image_fichier_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.fichier} ({self.etat})"
+
+
+class FichierMedia(models.Model):
+    """Nombre de champs qui désignent un fichier du stockage par empreinte (website.stockage)."""
+
+    nom = models.CharField(max_length=255, unique=True)
+    references = models.IntegerField(default=0)
+    # Réduit et sans métadonnées par `traiter_images` : ne pas le recompresser
+    traite = models.BooleanField(default=False)
+    date_add = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Fichier média'
+        verbose_name_plural = 'Fichiers médias'
+
+    def __str__(self):
+        return f"{self.nom} ({self.references})"
@@ -0,0 +1,73 @@
+from cities_light.models import City
+from django.db.models.signals import post_delete, post_save, pre_save
+
+from customer.models import ProduitPanier
+from shop.models import CategorieEtablissement, CategorieProduit, Etablissement, Produit
+from .cache import invalider
+from .images import champs_images
+from .models import Banniere, Galerie, Horaire, SiteInfo
+from .stockage import ajouter_references, champs_fichiers, modeles_fichiers, retirer_references
+from .taches import mettre_en_file
+from .villes import reinitialiser
+
+
+# Les données communes à toutes les pages ne changent que via l'admin
+for model in (SiteInfo, Galerie, Horaire, CategorieEtablissement, CategorieProduit):
+    post_save.connect(invalider, sender=model, dispatch_uid='site_cache_save_{}'.format(model.__name__))
+    post_delete.connect(invalider, sender=model, dispatch_uid='site_cache_delete_{}'.format(model.__name__))
+
+# La liste des villes gardée en mémoire est recalculée après un import cities_light
+post_save.connect(reinitialiser, sender=City, dispatch_uid='villes_save')
+post_delete.connect(reinitialiser, sender=City, dispatch_uid='villes_delete')
+
+
+def reperer_televersements(sender, instance, **kwargs):
+    # Avant la sauvegarde des champs : un fichier non « committed » vient d'être téléversé
+    instance._images_televersees = [
+        nom for nom in champs_images(sender) if getattr(instance, nom) and not getattr(instance, nom)._committed
+    ]
+
+
+def traiter_televersements(sender, instance, **kwargs):
+    champs = getattr(instance, '_images_televersees', None)
+    if champs:
+        mettre_en_file([getattr(instance, nom).name for nom in champs])
+        instance._images_televersees = []
+
+
+# Redimensionnement et dérivés des images téléversées : confiés au worker `traiter_images`
+for model in (Produit, Etablissement, Banniere):
+    pre_save.connect(reperer_televersements, sender=model, dispatch_uid='images_pre_{}'.format(model.__name__))
+    post_save.connect(traiter_televersements, sender=model, dispatch_uid='images_post_{}'.format(model.__name__))
+
+
+def noter_fichiers(sender, instance, raw=False, update_fields=None, **kwargs):
+    # Noms enregistrés avant la sauvegarde, pour décompter les fichiers remplacés
+    champs = [nom for nom in champs_fichiers(sender) if update_fields is None or nom in update_fields]
+    instance._fichiers_avant = {}
+    if champs and not raw and not instance._state.adding:
+        valeurs = sender._base_manager.filter(pk=instance.pk).values_list(*champs).first()
+        if valeurs is not None:
+            instance._fichiers_avant = dict(zip(champs, valeurs))
+
+
+def compter_fichiers(sender, instance, created, raw=False, **kwargs):
+    avant = getattr(instance, '_fichiers_avant', {})
+    champs = champs_fichiers(sender) if created else avant
+    apres = {nom: getattr(instance, nom).name for nom in champs}
+    ajouter_references([nom for champ, nom in apres.items() if nom != avant.get(champ)])
+    retirer_references([nom for champ, nom in avant.items() if nom != apres.get(champ)])
+    instance._fichiers_avant = {}
+
+
+def liberer_fichiers(sender, instance, **kwargs):
+    retirer_references([getattr(instance, nom).name for nom in champs_fichiers(sender)])
+
+
+# Compteurs de références du stockage par empreinte (website.stockage). Les lignes
+# de commande ne reçoivent leur image que par l'instantané de passer_commande, qui les compte.
+for model, _ in modeles_fichiers():
+    if model is not ProduitPanier:
+        pre_save.connect(noter_fichiers, sender=model, dispatch_uid='fichiers_pre_{}'.format(model.__name__))
+        post_save.connect(compter_fichiers, sender=model, dispatch_uid='fichiers_post_{}'.format(model.__name__))
+    post_delete.connect(liberer_fichiers, sender=model, dispatch_uid='fichiers_delete_{}'.format(model.__name__))
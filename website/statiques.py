@@ -0,0 +1,115 @@
+import os
+import re
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+
+
+BALISE_STATIC = re.compile(r"""\{%\s*static\s+['"]([^'"]+)['"]""")
+
+# Fichiers dont le texte peut désigner d'autres fichiers statiques
+TEXTES = {".css", ".js", ".html", ".svg"}
+
+
+def _dans_le_projet(chemin):
+    return Path(chemin).resolve().is_relative_to(Path(settings.BASE_DIR).resolve())
+
+
+def textes_gabarits():
+    """Contenu des gabarits du projet (applications locales et TEMPLATES DIRS)."""
+    dossiers = [Path(d) for moteur in settings.TEMPLATES for d in moteur.get("DIRS", [])]
+    dossiers += [Path(app.path) / "templates" for app in apps.get_app_configs() if _dans_le_projet(app.path)]
+    for dossier in dossiers:
+        for chemin in dossier.rglob("*.html"):
+            yield chemin.read_text(encoding="utf-8", errors="ignore")
+
+
+def inutilises(paths):
+    """Fichiers du thème que ni les gabarits ni les CSS/JS utilisés ne désignent.
+
+    `paths` est le {nom: (stockage source, chemin)} que collectstatic passe à
+    post_process. Seuls les fichiers du projet (static/, <app>/static/) sont
+    candidats : ceux de Django et des paquets tiers sont toujours gardés.
+    Un fichier est gardé dès que son nom apparaît dans un texte utilisé
+    (url() des CSS, chaînes des JS) : dans le doute, on garde.
+    """
+    theme = {nom for nom, (stockage, chemin) in paths.items() if _dans_le_projet(stockage.path(chemin))}
+    par_base = {}
+    for nom in theme:
+        par_base.setdefault(os.path.basename(nom), []).append(nom)
+
+    textes = list(textes_gabarits())
+    gardes = {nom for texte in textes for nom in BALISE_STATIC.findall(texte) if nom in theme}
+    a_lire = list(gardes)
+    while True:
+        for nom in a_lire:
+            if os.path.splitext(nom)[1].lower() in TEXTES:
+                stockage, chemin = paths[nom]
+                with stockage.open(chemin) as f:
+                    textes.append(f.read().decode("utf-8", errors="ignore"))
+        a_lire = [
+            nom for base, noms in par_base.items() for nom in noms
+            if nom not in gardes and any(base in texte for texte in textes)
+        ]
+        if not a_lire:
+            return theme - gardes
+        gardes.update(a_lire)
+
+
+def _taille(chemin):
+    try:
+        return os.path.getsize(chemin)
+    except OSError:
+        return 0
+
+
+class StockageStatiques(CompressedManifestStaticFilesStorage):
+    """Statiques à noms empreintés (mis en cache sans fin par WhiteNoise), compressés en gzip et Brotli.
+
+    collectstatic retire d'abord les fichiers du thème que rien n'utilise,
+    puis affiche le poids épargné.
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        elagues = {}
+        if not dry_run:
+            for nom in inutilises(paths):
+                elagues[nom] = _taille(self.path(nom))
+                self.delete(nom)
+            paths = {nom: source for nom, source in paths.items() if nom not in elagues}
+
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+
+        if not dry_run:
+            print(self.rapport(elagues))
+
+    def url_converter(self, name, hashed_files, template=None):
+        convertir = super().url_converter(name, hashed_files, template)
+
+        def converter(matchobj):
+            try:
+                return convertir(matchobj)
+            except ValueError:
+                # Référence vers un fichier absent (carte de sources, image du thème jamais livrée) : laissée telle quelle
+                return matchobj["matched"]
+
+        return converter
+
+    def rapport(self, elagues):
+        """Poids des fichiers élagués, puis des fichiers servis : bruts, gzip et Brotli."""
+        brut = gzip = brotli = 0
+        for nom in self.hashed_files.values():
+            taille = _taille(self.path(nom))
+            brut += taille
+            gzip += _taille(self.path(nom + ".gz")) or taille
+            brotli += _taille(self.path(nom + ".br")) or taille
+
+        def mo(octets):
+            return f"{octets / 1024 / 1024:.1f} Mo"
+
+        return (
+            f"{len(elagues)} fichier(s) du thème inutilisé(s) écarté(s) : {mo(sum(elagues.values()))}.\n"
+            f"{len(self.hashed_files)} fichier(s) servis : {mo(brut)} bruts, {mo(gzip)} en gzip, {mo(brotli)} en Brotli."
+        )
@@ -0,0 +1,274 @@
+import hashlib
+import logging
+import os
+import time
+from collections import Counter
+from functools import lru_cache
+from itertools import islice
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db import IntegrityError, models, transaction
+from django.db.models import F, Q
+
+
+logger = logging.getLogger(__name__)
+
+# media/contenu/<2 premiers caractères>/<sha256>.<extension>
+PREFIXE = "contenu"
+
+# Un fichier écrit ou réutilisé (StockageContenu._save) depuis moins longtemps peut
+# appartenir à un téléversement pas encore validé : laissé à nettoyer_medias
+DELAI_RECENT = 15 * 60
+
+
+class StockageContenu(FileSystemStorage):
+    """Stockage des médias nommés d'après l'empreinte SHA-256 de leur contenu.
+
+    Deux téléversements identiques partagent un seul fichier, et le contenu
+    derrière une URL ne change jamais : elle peut être mise en cache sans fin.
+    Les fichiers écrits avant ce stockage gardent leur nom.
+    """
+
+    def __init__(self, **kwargs):
+        # Le nom est fixé par le contenu : un fichier déjà présent est le même
+        kwargs.setdefault("allow_overwrite", True)
+        super().__init__(**kwargs)
+
+    def _save(self, name, content):
+        empreinte = hashlib.sha256()
+        for morceau in content.chunks():
+            empreinte.update(morceau)
+        nom = nom_contenu(empreinte.hexdigest(), name)
+        if self.exists(nom):
+            # Rajeuni : nettoyer_medias épargne les fichiers récents, le temps que la référence soit enregistrée
+            os.utime(self.path(nom))
+            return nom
+        return super()._save(nom, content)
+
+
+def nom_contenu(empreinte, nom):
+    extension = os.path.splitext(nom)[1].lower()
+    return f"{PREFIXE}/{empreinte[:2]}/{empreinte}{extension}"
+
+
+def est_contenu(nom):
+    return bool(nom) and nom.startswith(PREFIXE + "/")
+
+
+def champs_fichiers(modele):
+    """Noms (attname) des FileField / ImageField d'un modèle."""
+    return [champ.attname for champ in modele._meta.fields if isinstance(champ, models.FileField)]
+
+
+def modeles_fichiers():
+    """[(modèle, champs)] de tous les modèles du projet qui portent des fichiers."""
+    return [(modele, champs) for modele in apps.get_models() if (champs := champs_fichiers(modele))]
+
+
+def ajouter_references(noms):
+    from .models import FichierMedia
+
+    for nom, n in Counter(nom for nom in noms if est_contenu(nom)).items():
+        if FichierMedia.objects.filter(nom=nom).update(references=F("references") + n):
+            continue
+        try:
+            with transaction.atomic():
+                FichierMedia.objects.create(nom=nom, references=n)
+        except IntegrityError:
+            FichierMedia.objects.filter(nom=nom).update(references=F("references") + n)
+
+
+def retirer_references(noms):
+    """Décompte les références perdues ; les fichiers qui n'en ont plus sont supprimés après la transaction."""
+    from .models import FichierMedia
+
+    noms = Counter(nom for nom in noms if est_contenu(nom))
+    for nom, n in noms.items():
+        FichierMedia.objects.filter(nom=nom).update(references=F("references") - n)
+    if noms:
+        transaction.on_commit(lambda: supprimer_orphelins(list(noms)))
+
+
+def remplacer(ancien, nouveau):
+    """Reporte sur `nouveau` les champs fichiers et les références qui désignaient `ancien`.
+
+    `ancien` est supprimé après la transaction s'il n'est plus désigné,
+    ou par nettoyer_medias s'il est encore récent (voir supprimer_orphelins).
+    """
+    from .models import FichierMedia
+
+    with transaction.atomic():
+        for modele, champs in modeles_fichiers():
+            for champ in champs:
+                modele._base_manager.filter(**{champ: ancien}).update(**{champ: nouveau})
+        references = FichierMedia.objects.filter(nom=ancien).values_list("references", flat=True).first() or 0
+        ajouter_references([nouveau] * references)
+        FichierMedia.objects.filter(nom=ancien).update(references=0)
+        transaction.on_commit(lambda: supprimer_orphelins([ancien]))
+
+
+def references_en_base(noms):
+    """Parmi `noms`, ceux qu'un champ fichier de la base désigne encore (une requête par modèle)."""
+    trouves = set()
+    for modele, champs in modeles_fichiers():
+        condition = Q()
+        for champ in champs:
+            condition |= Q(**{f"{champ}__in": noms})
+        for valeurs in modele._base_manager.filter(condition).values_list(*champs):
+            trouves.update(valeurs)
+    return trouves & set(noms)
+
+
+def _recent(nom, limite):
+    try:
+        return os.path.getmtime(default_storage.path(nom)) >= limite
+    except OSError:
+        return False
+
+
+def supprimer_orphelins(noms):
+    """Supprime les fichiers de `noms` sans référence, ainsi que leurs dérivés.
+
+    Le compteur est recoupé avec la base avant toute suppression : une
+    référence écrite sans passer par save() (update, bulk_create) protège
+    quand même le fichier. Un fichier modifié depuis moins de DELAI_RECENT
+    secondes est épargné : le même contenu vient peut-être d'être téléversé
+    par une transaction encore ouverte, que ni le compteur ni la base ne
+    voient encore.
+    """
+    from .models import FichierMedia
+
+    gardes = set(FichierMedia.objects.filter(nom__in=noms, references__gt=0).values_list("nom", flat=True))
+    candidats = set(noms) - gardes
+    if candidats:
+        candidats -= references_en_base(candidats)
+    limite = time.time() - DELAI_RECENT
+    candidats = {nom for nom in candidats if not _recent(nom, limite)}
+
+    for nom in sorted(candidats):
+        FichierMedia.objects.filter(nom=nom, references__lte=0).delete()
+        effacer(nom)
+        logger.info("Fichier orphelin supprimé : %s", nom)
+    return sorted(candidats)
+
+
+def derives_de(nom):
+    from . import images
+
+    return [images.nom_derive(nom, taille, format) for taille in images.TAILLES for format in images.FORMATS]
+
+
+def effacer(nom):
+    """Supprime le fichier `nom`, ses dérivés et ses tâches de traitement."""
+    from . import images
+    from .models import TacheImage
+
+    for fichier in [nom, *derives_de(nom)]:
+        default_storage.delete(fichier)
+        images._existants.discard(fichier)
+    # Le même contenu téléversé de nouveau devra être traité à nouveau
+    TacheImage.objects.filter(fichier=nom).delete()
+
+
+def noms_par_defaut():
+    """Valeurs par défaut des champs fichiers (b-1.jpg, logo.png…), à garder même sans ligne qui les désigne."""
+    return {
+        champ.default for modele, champs in modeles_fichiers() for champ in modele._meta.fields
+        if champ.attname in champs and isinstance(champ.default, str)
+    }
+
+
+def _fichiers(racine, dossier="", exclure=()):
+    """(nom relatif, octets, date de modification) des fichiers sous `dossier`, au fil du parcours."""
+    try:
+        entrees = os.scandir(os.path.join(racine, dossier))
+    except FileNotFoundError:
+        return
+    with entrees:
+        for entree in entrees:
+            nom = f"{dossier}/{entree.name}" if dossier else entree.name
+            try:
+                if entree.is_dir(follow_symlinks=False):
+                    if nom not in exclure:
+                        yield from _fichiers(racine, nom, exclure)
+                elif entree.is_file(follow_symlinks=False):
+                    stat = entree.stat(follow_symlinks=False)
+                    yield nom, stat.st_size, stat.st_mtime
+            except FileNotFoundError:
+                continue
+
+
+def _paquets(elements, taille):
+    elements = iter(elements)
+    while paquet := list(islice(elements, taille)):
+        yield paquet
+
+
+def _octets(racine, noms):
+    total = 0
+    for nom in noms:
+        try:
+            total += os.path.getsize(os.path.join(racine, nom))
+        except OSError:
+            pass
+    return total
+
+
+def nettoyer_medias(taille=1000, age=24 * 3600, supprimer=True):
+    """Retire de MEDIA_ROOT les fichiers qu'aucun FileField / ImageField du projet ne désigne.
+
+    Le disque est parcouru par paquets de `taille` fichiers, chacun recoupé
+    avec la base en une requête par modèle : la mémoire ne dépend que du
+    nombre d'orphelins, pas de celui des fichiers. Les fichiers modifiés depuis moins de `age` secondes
+    sont épargnés (téléversement dont la ligne n'est pas encore validée).
+    Les dérivés (media/derives) partent avec leur original. Génère, après
+    chaque paquet, (fichiers examinés, octets examinés, [(nom, octets)] des
+    orphelins, dérivés compris).
+    """
+    from . import images
+    from .models import FichierMedia
+
+    racine = str(settings.MEDIA_ROOT)
+    limite = time.time() - age
+    proteges = noms_par_defaut()
+    # Originaux orphelins sans extension : leurs dérivés sont déjà comptés
+    souches = set()
+
+    for paquet in _paquets(_fichiers(racine, exclure={images.DOSSIER}), taille):
+        anciens = [nom for nom, _, modifie in paquet if modifie < limite and nom not in proteges]
+        references = references_en_base(anciens) if anciens else set()
+        octets = {nom: n for nom, n, _ in paquet}
+        orphelins = []
+        for nom in anciens:
+            if nom in references:
+                continue
+            souches.add(os.path.splitext(nom)[0])
+            orphelins.append((nom, octets[nom] + _octets(racine, derives_de(nom))))
+            if supprimer:
+                if est_contenu(nom):
+                    FichierMedia.objects.filter(nom=nom).delete()
+                effacer(nom)
+        yield len(paquet), sum(octets.values()), orphelins
+
+    @lru_cache(maxsize=64)
+    def presents(dossier):
+        try:
+            return {os.path.splitext(nom)[0] for nom in os.listdir(os.path.join(racine, dossier))}
+        except FileNotFoundError:
+            return set()
+
+    # Dérivés restés sans original : derives/<taille>/<chemin de l'original sans extension>.<format>
+    for paquet in _paquets(_fichiers(racine, images.DOSSIER), taille):
+        orphelins = []
+        for nom, n, modifie in paquet:
+            souche = os.path.splitext(nom.split("/", 2)[-1])[0]
+            if modifie >= limite or souche in souches:
+                continue
+            dossier, base = os.path.split(souche)
+            if base not in presents(dossier):
+                orphelins.append((nom, n))
+                if supprimer:
+                    default_storage.delete(nom)
+        yield len(paquet), sum(n for _, n, _ in paquet), orphelins
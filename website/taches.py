@@ -0,0 +1,100 @@
+import datetime
+import logging
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import images
+from .models import FichierMedia, TacheImage
+from .stockage import remplacer
+
+
+logger = logging.getLogger(__name__)
+
+# Une tâche « en cours » depuis plus longtemps a perdu son worker
+DELAI_ABANDON = datetime.timedelta(minutes=10)
+
+NON_TERMINEES = [TacheImage.EN_ATTENTE, TacheImage.EN_COURS]
+
+
+def mettre_en_file(noms):
+    """Confie les images téléversées au worker, après validation de la transaction courante."""
+    def creer():
+        deja = set(TacheImage.objects.filter(fichier__in=noms, etat__in=NON_TERMINEES).values_list('fichier', flat=True))
+        # Un fichier déjà traité est partagé (stockage par empreinte) : ne pas le recompresser
+        deja.update(FichierMedia.objects.filter(nom__in=noms, traite=True).values_list('nom', flat=True))
+        TacheImage.objects.bulk_create([TacheImage(fichier=nom) for nom in set(noms) - deja])
+    if noms:
+        transaction.on_commit(creer)
+
+
+def en_traitement(nom):
+    """L'image attend encore son traitement : ne pas l'afficher telle que téléversée."""
+    return TacheImage.objects.filter(fichier=nom, etat__in=NON_TERMINEES).exists()
+
+
+def prendre_taches(nombre):
+    """Réserve jusqu'à `nombre` tâches en attente, les plus anciennes d'abord (UPDATE conditionnel)."""
+    maintenant = timezone.now()
+    # Une image qui tue ou bloque le processus à chaque essai finit en échec
+    abandonnees = TacheImage.objects.filter(etat=TacheImage.EN_COURS, date_debut__lt=maintenant - DELAI_ABANDON)
+    maximum = getattr(settings, 'IMAGE_MAX_ATTEMPTS', 3)
+    abandonnees.filter(tentatives__gte=maximum).update(
+        etat=TacheImage.ECHEC, erreur="Worker perdu pendant le traitement", date_fin=maintenant,
+    )
+    abandonnees.filter(tentatives__lt=maximum).update(etat=TacheImage.EN_ATTENTE)
+    taches = []
+    for tache_id in TacheImage.objects.filter(etat=TacheImage.EN_ATTENTE).order_by('date_add').values_list('id', flat=True)[:nombre]:
+        reservee = TacheImage.objects.filter(id=tache_id, etat=TacheImage.EN_ATTENTE).update(
+            etat=TacheImage.EN_COURS, date_debut=maintenant, tentatives=F('tentatives') + 1,
+        )
+        if reservee:
+            taches.append(TacheImage.objects.get(id=tache_id))
+    return taches
+
+
+def conclure(tache, erreur=None):
+    if erreur is None:
+        tache.etat = TacheImage.TERMINEE
+        tache.erreur = ''
+        tache.date_fin = timezone.now()
+        FichierMedia.objects.filter(nom=tache.fichier).update(traite=True)
+    else:
+        tache.erreur = erreur
+        if tache.tentatives >= getattr(settings, 'IMAGE_MAX_ATTEMPTS', 3):
+            tache.etat = TacheImage.ECHEC
+            tache.date_fin = timezone.now()
+        else:
+            tache.etat = TacheImage.EN_ATTENTE
+    tache.save(update_fields=['etat', 'erreur', 'date_fin'])
+
+
+def traiter_file(executor, processus):
+    """Traite un lot de tâches dans le pool de processus `executor` ; retourne les tâches traitées."""
+    taches = prendre_taches(2 * processus)
+    dimension_max = getattr(settings, 'IMAGE_MAX_DIMENSION', 2400)
+    en_cours = []
+    for tache in taches:
+        if not default_storage.exists(tache.fichier):
+            conclure(tache, "Fichier introuvable")
+            continue
+        en_cours.append((tache, executor.submit(images.traiter_fichier, default_storage.location, tache.fichier, dimension_max)))
+
+    for tache, futur in en_cours:
+        try:
+            nom, avant, apres = futur.result()
+        except Exception as exc:
+            logger.exception("Traitement de l'image %s", tache.fichier)
+            conclure(tache, str(exc))
+            continue
+        logger.info("Image %s traitée : %d -> %d octets (%s)", tache.fichier, avant, apres, nom)
+        if nom != tache.fichier:
+            # Optimisé sous une nouvelle empreinte : la tâche le suit avant que l'ancien fichier ne parte
+            ancien, tache.fichier = tache.fichier, nom
+            tache.save(update_fields=['fichier'])
+            remplacer(ancien, nom)
+        conclure(tache)
+    return taches
@@ -0,0 +1,51 @@
+from django import template
+from django.utils.html import format_html, format_html_join
+
+from website import images
+from website.taches import en_traitement
+
+
+register = template.Library()
+
+
+@register.simple_tag
+def image_responsive(fichier, taille="moyenne", sizes=None, **attributs):
+    """<picture> AVIF / WebP / JPEG d'une image téléversée, en dérivés redimensionnés.
+
+    {% image_responsive produit.image "miniature" sizes="60px" alt=produit.nom width=60 %}
+    `taille` est celle du src de repli ; le navigateur choisit dans le srcset
+    d'après `sizes` (par défaut la largeur de `taille`). Le src de repli est
+    lui aussi un dérivé, généré à la première demande : jamais l'original brut.
+    """
+    if not fichier:
+        return ""
+    attributs.setdefault("alt", "")
+    attributs.setdefault("loading", "lazy")
+    src = images.url_derive(fichier.name, taille, "jpg")
+    sizes = sizes or f"{images.TAILLES[taille]}px"
+    srcset = images.sources(fichier.name)
+    return format_html(
+        '<picture>{}<img src="{}" srcset="{}" sizes="{}"{}></picture>',
+        format_html_join(
+            "", '<source type="{}" srcset="{}" sizes="{}">',
+            ((images.FORMATS[format][1], srcset[format], sizes) for format in images.FORMATS if format != "jpg"),
+        ),
+        src,
+        srcset["jpg"],
+        sizes,
+        format_html_join("", ' {}="{}"', attributs.items()),
+    )
+
+
+@register.filter
+def url_image(fichier):
+    """URL de l'original, ou de l'image d'attente tant que le worker ne l'a pas traité.
+
+    Pour les pages qui affichent l'original (fiche produit) ; les listes passent
+    par image_responsive, dont le srcset ne sert jamais l'original brut.
+    """
+    if not fichier:
+        return ""
+    if en_traitement(fichier.name):
+        return images.ATTENTE
+    return fichier.url
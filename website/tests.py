@@ -1,10 +1,37 @@
-from django.test import TestCase, Client
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+from io import BytesIO, StringIO
+
+from django.test import TestCase, Client, RequestFactory
 from unittest.mock import patch, MagicMock
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db.models.fields.files import FieldFile
+from django.template import Context, Template
 
 from django.urls import reverse
 import pytest
+from PIL import Image
 
 from shop.models import Produit
+from customer.models import Panier
+from website import context_processors, images
+from website.images import generer, generer_tous, nom_derive
+from website.models import Banniere, FichierMedia, Galerie, Horaire, TacheImage
+from website.stockage import DELAI_RECENT, supprimer_orphelins
+from website.taches import DELAI_ABANDON, prendre_taches, traiter_file
+from cities_light.models import City, Country
 
 
 class TestUnitaire(TestCase):
@@ -108,6 +135,398 @@ class TestUnitaire(TestCase):
         self.assertIn("Nous sommes la meilleure plateforme", content)
 
 
+class CartContextProcessorTest(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def make_request(self, session=None):
+        request = self.factory.get('/')
+        request.user = AnonymousUser()
+        if session is None:
+            SessionMiddleware(lambda r: None).process_request(request)
+        else:
+            request.session = session
+        return request
+
+    def test_cart_is_lazy(self):
+        request = self.make_request()
+        with self.assertNumQueries(0):
+            context_processors.cart(request)
+        self.assertEqual(Panier.objects.count(), 0)
+
+    def test_cart_created_once_per_session(self):
+        request = self.make_request()
+        panier = context_processors.cart(request)['cart']
+        self.assertIsNotNone(panier.id)
+        self.assertEqual(request.session['panier_id'], panier.id)
+        request.session.save()
+
+        # Requête suivante : le panier est relu via l'id stocké en session
+        request = self.make_request(session=request.session)
+        with self.assertNumQueries(1):
+            self.assertEqual(context_processors.cart(request)['cart'].id, panier.id)
+        self.assertEqual(Panier.objects.count(), 1)
+
+    def test_cart_recreated_after_checkout(self):
+        request = self.make_request()
+        panier = context_processors.cart(request)['cart']
+        panier_id = panier.id
+        Panier.objects.filter(id=panier_id).delete()
+
+        nouveau = context_processors.cart(self.make_request(session=request.session))['cart']
+        self.assertNotEqual(nouveau.id, panier_id)
+
+
+class SiteCacheTest(TestCase):
+    def setUp(self):
+        self.request = RequestFactory().get('/')
+
+    def contexte(self):
+        contexte = {}
+        for processor in (context_processors.categories, context_processors.site_infos,
+                          context_processors.galeries, context_processors.horaires):
+            contexte.update(processor(self.request))
+        return contexte
+
+    def test_aucune_requete_apres_le_premier_rendu(self):
+        self.contexte()
+        with self.assertNumQueries(0):
+            contexte = self.contexte()
+        self.assertEqual(contexte['horaires'], [])
+        self.assertIsNone(contexte['infos'])
+
+    def test_invalidation_par_signal(self):
+        self.assertEqual(self.contexte()['horaires'], [])
+        horaire = Horaire.objects.create(titre="Lundi", description="8h - 18h", status=True)
+        self.assertEqual(self.contexte()['horaires'], [horaire])
+
+        horaire.delete()
+        self.assertEqual(self.contexte()['horaires'], [])
+
+
+class VillesTest(TestCase):
+    def setUp(self):
+        pays = Country.objects.create(name="Côte d'Ivoire", code2="CI")
+        self.abidjan = City.objects.create(name="Abidjan", country=pays)
+        self.abengourou = City.objects.create(name="Abengourou", country=pays)
+        self.bouake = City.objects.create(name="Bouaké", country=pays)
+
+    def test_liste_json_cacheable(self):
+        response = self.client.get(reverse('villes'))
+        self.assertEqual(response.json()['villes'], [
+            [self.abengourou.id, "Abengourou"], [self.abidjan.id, "Abidjan"], [self.bouake.id, "Bouaké"],
+        ])
+        self.assertIn('max-age=86400', response['Cache-Control'])
+
+        response = self.client.get(reverse('villes'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_autocomplete_par_prefixe(self):
+        response = self.client.get(reverse('villes_autocomplete'), {'q': 'ab'})
+        self.assertEqual([v[1] for v in response.json()['villes']], ["Abengourou", "Abidjan"])
+
+        response = self.client.get(reverse('villes_autocomplete'), {'q': 'BOUAKE'})
+        self.assertEqual(response.json()['villes'], [[self.bouake.id, "Bouaké"]])
+
+    def test_liste_recalculee_apres_ajout(self):
+        self.client.get(reverse('villes'))
+        yamoussoukro = City.objects.create(name="Yamoussoukro", country=self.abidjan.country)
+        ids = [v[0] for v in self.client.get(reverse('villes')).json()['villes']]
+        self.assertIn(yamoussoukro.id, ids)
+
+
+
+class MediaTemporaireTestCase(TestCase):
+    """MEDIA_ROOT dans un dossier temporaire, vidé avec le cache des dérivés connus."""
+
+    reglages = {}
+
+    def setUp(self):
+        self.media = self.dossier_temporaire()
+        reglages = self.settings(MEDIA_ROOT=self.media, **self.reglages)
+        reglages.enable()
+        self.addCleanup(reglages.disable)
+        images._existants.clear()
+        self.addCleanup(images._existants.clear)
+
+    def dossier_temporaire(self):
+        dossier = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, dossier, ignore_errors=True)
+        return dossier
+
+    def vieillir(self, nom):
+        """Recule la date de modification de `nom` au-delà de DELAI_RECENT."""
+        ancien = time.time() - DELAI_RECENT - 60
+        os.utime(default_storage.path(nom), (ancien, ancien))
+
+
+class ImagesResponsivesTest(MediaTemporaireTestCase):
+    def setUp(self):
+        super().setUp()
+        sortie = BytesIO()
+        Image.new("RGBA", (2000, 1000), (200, 30, 30, 128)).save(sortie, "PNG")
+        self.nom = default_storage.save("produis/images/photo.png", BytesIO(sortie.getvalue()))
+
+    def test_generation_a_la_premiere_demande(self):
+        response = self.client.get(reverse('image_derivee', args=['moyenne', 'webp', self.nom]))
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        self.assertIn('max-age=2592000', response['Cache-Control'])
+        with default_storage.open(nom_derive(self.nom, 'moyenne', 'webp')) as f:
+            self.assertEqual(Image.open(f).size, (480, 240))
+
+        # JPEG sans transparence, original jamais agrandi
+        self.client.get(reverse('image_derivee', args=['grande', 'jpg', self.nom]))
+        with default_storage.open(nom_derive(self.nom, 'grande', 'jpg')) as f:
+            image = Image.open(f)
+            self.assertEqual((image.mode, image.size), ('RGB', (1200, 600)))
+
+        self.assertEqual(self.client.get(reverse('image_derivee', args=['enorme', 'jpg', self.nom])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('image_derivee', args=['moyenne', 'jpg', '../settings.py'])).status_code, 404)
+
+    def test_balise_picture(self):
+        fichier = FieldFile(None, Produit._meta.get_field('image'), self.nom)
+        gabarit = Template('{% load images_responsives %}{% image_responsive image "miniature" sizes="60px" alt=nom %}')
+
+        html = gabarit.render(Context({'image': fichier, 'nom': 'Pizza & co'}))
+        self.assertIn('<source type="image/avif"', html)
+        self.assertIn('alt="Pizza &amp; co"', html)
+        # Pas encore générés : src et srcset passent par la vue qui les crée, jamais par l'original
+        self.assertIn(reverse('image_derivee', args=['miniature', 'jpg', self.nom]) + ' 160w', html)
+        self.assertIn('src="{}"'.format(reverse('image_derivee', args=['miniature', 'jpg', self.nom])), html)
+        self.assertNotIn('/media/{}"'.format(self.nom), html)
+
+        self.assertEqual(len(generer_tous(self.nom)), 9)
+        self.assertEqual(generer_tous(self.nom), [])
+        html = gabarit.render(Context({'image': fichier, 'nom': 'Pizza'}))
+        self.assertIn('src="/media/{}"'.format(nom_derive(self.nom, 'miniature', 'jpg')), html)
+        self.assertIn('/media/{} 1200w'.format(nom_derive(self.nom, 'grande', 'webp')), html)
+        self.assertEqual(gabarit.render(Context({'image': None})), '')
+
+
+class TraitementImagesTest(MediaTemporaireTestCase):
+    reglages = {'IMAGE_MAX_DIMENSION': 800}
+
+    def photo(self):
+        image = Image.new("RGB", (3000, 1500), (10, 120, 200))
+        exif = image.getexif()
+        exif[0x0112] = 1  # orientation
+        exif[0x010F] = "Appareil"
+        sortie = BytesIO()
+        image.save(sortie, "JPEG", exif=exif)
+        return SimpleUploadedFile("photo.jpg", sortie.getvalue(), content_type="image/jpeg")
+
+    def test_televersement_mis_en_file_puis_traite(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            banniere = Banniere.objects.create(titre="Promo", description="d", couverture=self.photo())
+        tache = TacheImage.objects.get()
+        self.assertEqual((tache.fichier, tache.etat), (banniere.couverture.name, TacheImage.EN_ATTENTE))
+
+        # Sauvegarde sans nouveau fichier : rien de plus dans la file
+        with self.captureOnCommitCallbacks(execute=True):
+            banniere.save()
+        self.assertEqual(TacheImage.objects.count(), 1)
+
+        # Image d'attente sur la fiche tant que le worker n'est pas passé
+        gabarit = Template('{% load images_responsives %}{% image_responsive image "moyenne" %}|{{ image|url_image }}')
+        html = gabarit.render(Context({'image': banniere.couverture}))
+        self.assertTrue(html.endswith('|data:image/svg+xml,' + images.ATTENTE.split(',', 1)[1]))
+
+        televerse = banniere.couverture.name
+        with ThreadPoolExecutor(max_workers=1) as executor, self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(len(traiter_file(executor, 1)), 1)
+        tache.refresh_from_db()
+        banniere.refresh_from_db()
+        self.assertEqual(tache.etat, TacheImage.TERMINEE)
+
+        # Original réduit et sans EXIF, enregistré sous sa propre empreinte
+        self.assertNotEqual(banniere.couverture.name, televerse)
+        self.assertEqual(tache.fichier, banniere.couverture.name)
+        # Le téléversé brut n'est plus désigné, mais récent : gardé jusqu'au passage suivant
+        self.assertEqual(FichierMedia.objects.get(nom=televerse).references, 0)
+        self.assertTrue(default_storage.exists(televerse))
+        self.vieillir(televerse)
+        self.assertEqual(supprimer_orphelins([televerse]), [televerse])
+        self.assertFalse(default_storage.exists(televerse))
+        self.assertFalse(FichierMedia.objects.filter(nom=televerse).exists())
+        fichier = FichierMedia.objects.get(nom=banniere.couverture.name)
+        self.assertEqual((fichier.references, fichier.traite), (1, True))
+        with default_storage.open(banniere.couverture.name) as f:
+            contenu = f.read()
+        self.assertIn(hashlib.sha256(contenu).hexdigest(), banniere.couverture.name)
+        original = Image.open(BytesIO(contenu))
+        self.assertEqual(original.size, (800, 400))
+        self.assertEqual(len(original.getexif()), 0)
+        self.assertTrue(default_storage.exists(nom_derive(banniere.couverture.name, 'grande', 'avif')))
+        html = gabarit.render(Context({'image': banniere.couverture}))
+        self.assertIn('src="/media/{}"'.format(nom_derive(banniere.couverture.name, 'moyenne', 'jpg')), html)
+        self.assertTrue(html.endswith('|' + banniere.couverture.url))
+
+    def test_retraite_apres_suppression(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            banniere = Banniere.objects.create(titre="Promo", description="d", couverture=self.photo())
+        with ThreadPoolExecutor(max_workers=1) as executor, self.captureOnCommitCallbacks(execute=True):
+            traiter_file(executor, 1)
+        banniere.refresh_from_db()
+        self.assertTrue(FichierMedia.objects.get(nom=banniere.couverture.name).traite)
+
+        # Le contenu déjà optimisé, téléversé de nouveau, tombe sur le même nom : pas de nouvelle tâche
+        with default_storage.open(banniere.couverture.name) as f:
+            optimise = SimpleUploadedFile("copie.jpg", f.read(), content_type="image/jpeg")
+        with self.captureOnCommitCallbacks(execute=True):
+            copie = Banniere.objects.create(titre="Copie", description="d", couverture=optimise)
+        self.assertEqual(copie.couverture.name, banniere.couverture.name)
+        self.assertFalse(TacheImage.objects.filter(etat=TacheImage.EN_ATTENTE).exists())
+
+        # Plus référencé : fichier, dérivés et tâches supprimés ; le même téléversement repasse par le worker
+        self.vieillir(banniere.couverture.name)
+        with self.captureOnCommitCallbacks(execute=True):
+            Banniere.objects.all().delete()
+        self.assertFalse(TacheImage.objects.exists())
+        with self.captureOnCommitCallbacks(execute=True):
+            Banniere.objects.create(titre="Promo", description="d", couverture=self.photo())
+        self.assertEqual(TacheImage.objects.get().etat, TacheImage.EN_ATTENTE)
+
+    def test_tache_abandonnee_limitee_en_tentatives(self):
+        nom = default_storage.save("photo.jpg", self.photo())
+        tache = TacheImage.objects.create(fichier=nom)
+        with self.settings(IMAGE_MAX_ATTEMPTS=2):
+            # Processus mort pendant le traitement : remise en attente tant qu'il reste des tentatives
+            for _ in range(2):
+                self.assertEqual([t.id for t in prendre_taches(1)], [tache.id])
+                TacheImage.objects.filter(id=tache.id).update(date_debut=tache.date_add - DELAI_ABANDON)
+            self.assertEqual(prendre_taches(1), [])
+        tache.refresh_from_db()
+        self.assertEqual((tache.etat, tache.tentatives), (TacheImage.ECHEC, 2))
+
+    def test_echec_apres_plusieurs_essais(self):
+        nom = default_storage.save("media/bannieres/pas-une-image.jpg", ContentFile(b"texte"))
+        tache = TacheImage.objects.create(fichier=nom)
+        with self.settings(IMAGE_MAX_ATTEMPTS=2), ThreadPoolExecutor(max_workers=1) as executor:
+            traiter_file(executor, 1)
+            tache.refresh_from_db()
+            self.assertEqual((tache.etat, tache.tentatives), (TacheImage.EN_ATTENTE, 1))
+            traiter_file(executor, 1)
+        tache.refresh_from_db()
+        self.assertEqual(tache.etat, TacheImage.ECHEC)
+
+
+class StockageContenuTest(MediaTemporaireTestCase):
+    def banniere(self, contenu, nom="photo.jpg"):
+        return Banniere.objects.create(titre="Promo", description="d", couverture=SimpleUploadedFile(nom, contenu))
+
+    def test_televersements_identiques_partages(self):
+        premiere = self.banniere(b"meme contenu", "logo.JPG")
+        seconde = self.banniere(b"meme contenu", "autre-nom.jpg")
+        empreinte = hashlib.sha256(b"meme contenu").hexdigest()
+
+        self.assertEqual(premiere.couverture.name, f"contenu/{empreinte[:2]}/{empreinte}.jpg")
+        self.assertEqual(seconde.couverture.name, premiere.couverture.name)
+        self.assertEqual(FichierMedia.objects.get(nom=premiere.couverture.name).references, 2)
+
+        # URL immuable, mise en cache sans fin par le serveur web (deploy/nginx.conf)
+        self.assertEqual(premiere.couverture.url, f"/media/contenu/{empreinte[:2]}/{empreinte}.jpg")
+        with default_storage.open(premiere.couverture.name) as f:
+            self.assertEqual(f.read(), b"meme contenu")
+
+    def test_orphelins_supprimes(self):
+        premiere = self.banniere(b"logo")
+        seconde = self.banniere(b"logo")
+        nom = premiere.couverture.name
+
+        # Encore utilisé par la seconde bannière
+        with self.captureOnCommitCallbacks(execute=True):
+            premiere.delete()
+        self.assertTrue(default_storage.exists(nom))
+        self.assertEqual(FichierMedia.objects.get(nom=nom).references, 1)
+
+        # Remplacé : plus aucune référence, fichier et dérivés supprimés
+        derive = nom_derive(nom, "moyenne", "webp")
+        generer(nom, "moyenne", "webp", Image.new("RGB", (10, 10)))
+        self.vieillir(nom)
+        with self.captureOnCommitCallbacks(execute=True):
+            seconde.couverture = SimpleUploadedFile("nouveau.jpg", b"nouveau logo")
+            seconde.save()
+        self.assertFalse(default_storage.exists(nom))
+        self.assertFalse(default_storage.exists(derive))
+        self.assertFalse(FichierMedia.objects.filter(nom=nom).exists())
+        self.assertTrue(default_storage.exists(seconde.couverture.name))
+
+    def test_televersement_concurrent_protege_le_fichier(self):
+        banniere = self.banniere(b"logo")
+        nom = banniere.couverture.name
+        self.vieillir(nom)
+
+        # Le même contenu, téléversé ailleurs pendant que la dernière référence disparaît :
+        # _save réutilise le fichier, dont la ligne n'est pas encore validée
+        self.assertEqual(default_storage.save("photo.jpg", ContentFile(b"logo")), nom)
+        with self.captureOnCommitCallbacks(execute=True):
+            banniere.delete()
+        self.assertTrue(default_storage.exists(nom))
+
+    def test_reference_sans_save_protege_le_fichier(self):
+        banniere = self.banniere(b"image")
+        # Recopiée par bulk_create(), sans signal ni compteur
+        Galerie.objects.bulk_create([Galerie(titre="g", description="d", image=banniere.couverture.name)])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            banniere.delete()
+        self.assertTrue(default_storage.exists(banniere.couverture.name))
+
+    def test_nettoyage_des_orphelins(self):
+        def ecrire(nom, contenu=b"x" * 10, age=48 * 3600):
+            chemin = default_storage.path(nom)
+            os.makedirs(os.path.dirname(chemin), exist_ok=True)
+            with open(chemin, "wb") as f:
+                f.write(contenu)
+            os.utime(chemin, (time.time() - age, time.time() - age))
+
+        garde = self.banniere(b"utilisee").couverture.name
+        os.utime(default_storage.path(garde), (0, 0))
+        ecrire("produis/images/vieux.jpg")
+        ecrire("derives/moyenne/produis/images/vieux.webp")
+        ecrire("derives/grande/produis/images/disparu.avif")
+        ecrire("b-1.jpg")
+        recent = default_storage.save("produis/images/recent.jpg", ContentFile(b"en cours"))
+
+        sortie = StringIO()
+        call_command("nettoyer_medias", "--dry-run", "--taille", "2", stdout=sortie)
+        # Le dérivé de vieux.jpg est compté avec lui
+        self.assertIn("2 orphelin(s) à supprimer", sortie.getvalue())
+        self.assertIn("produis/images/vieux.jpg", sortie.getvalue())
+        self.assertIn("6 fichier(s)", sortie.getvalue())
+        self.assertTrue(default_storage.exists("produis/images/vieux.jpg"))
+
+        call_command("nettoyer_medias", stdout=StringIO())
+        for nom in ("produis/images/vieux.jpg", "derives/moyenne/produis/images/vieux.webp", "derives/grande/produis/images/disparu.avif"):
+            self.assertFalse(default_storage.exists(nom), nom)
+        for nom in (garde, "b-1.jpg", recent):
+            self.assertTrue(default_storage.exists(nom), nom)
+
+
+class StatiquesTest(MediaTemporaireTestCase):
+    def test_collectstatic_empreinte_compresse_et_elague(self):
+        racine = self.dossier_temporaire()
+        stockages = {**settings.STORAGES, "staticfiles": {"BACKEND": "website.statiques.StockageStatiques"}}
+        sortie = StringIO()
+        with self.settings(STATIC_ROOT=racine, STORAGES=stockages), redirect_stdout(sortie):
+            call_command("collectstatic", interactive=False, verbosity=0)
+
+        with open(os.path.join(racine, "staticfiles.json")) as f:
+            manifeste = json.load(f)["paths"]
+        vue = manifeste["js/vue.js"]
+        self.assertRegex(vue, r"^js/vue\.[0-9a-f]{12}\.js$")
+        self.assertTrue(os.path.exists(os.path.join(racine, vue + ".gz")))
+        # Seule la copie empreintée reste
+        self.assertFalse(os.path.exists(os.path.join(racine, "js/vue.js")))
+        # Image de démonstration du thème jamais utilisée
+        self.assertNotIn("tmp/iphone.png", manifeste)
+        self.assertFalse(os.path.exists(os.path.join(racine, "tmp/iphone.png")))
+        # Gardés : Django et les polices désignées par les CSS utilisées
+        self.assertIn("admin/css/base.css", manifeste)
+        self.assertIn("fonts/fontawesome-webfont3295.woff2", manifeste)
+        self.assertIn("fichier(s) du thème inutilisé(s) écarté(s)", sortie.getvalue())
+
+
 @pytest.mark.django_db
 class TestFonctionnel:
 
@@ -5,4 +5,7 @@ from . import views
 urlpatterns = [
     path('', views.index, name='index'),
     path('a-propos', views.about, name='about'),
+    path('villes.json', views.villes, name='villes'),
+    path('villes/autocomplete', views.villes_autocomplete, name='villes_autocomplete'),
+    path('images/<str:taille>/<str:format>/<path:nom>', views.image_derivee, name='image_derivee'),
 ]
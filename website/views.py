@@ -1,5 +1,12 @@
 from django.shortcuts import render
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, JsonResponse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import etag
 from . import models
+from . import images
+from . import villes as villes_service
 from shop import models as shop_models
 
 
@@ -29,4 +36,33 @@ def about(request):
         'why_choose': why_choose,
 
     }
-    return render(request, 'about-us.html', datas)
\ No newline at end of file
+    return render(request, 'about-us.html', datas)
+
+
+@cache_control(public=True, max_age=86400)
+@etag(lambda request: villes_service.etag())
+def villes(request):
+    # Servie une fois puis gardée par le navigateur : les formulaires remplissent leur liste en JS
+    return JsonResponse({'villes': villes_service.villes()})
+
+
+def villes_autocomplete(request):
+    try:
+        limite = min(int(request.GET.get('limite', 10)), 50)
+    except ValueError:
+        limite = 10
+    return JsonResponse({'villes': villes_service.autocompleter(request.GET.get('q', ''), limite)})
+
+
+@cache_control(public=True, max_age=2592000)
+def image_derivee(request, taille, format, nom):
+    # Première demande d'un dérivé : généré, écrit dans media/derives puis servi par le serveur web
+    if taille not in images.TAILLES or format not in images.FORMATS:
+        raise Http404
+    try:
+        if not default_storage.exists(nom):
+            raise Http404
+        derive = images.generer(nom, taille, format)
+    except (SuspiciousFileOperation, OSError):
+        raise Http404
+    return FileResponse(default_storage.open(derive, 'rb'), content_type=images.FORMATS[format][1])
@@ -0,0 +1,46 @@
+import bisect
+import hashlib
+import json
+
+from cities_light.models import City
+
+from shop.search import normaliser
+
+
+_villes = None
+_index = None
+_etag = None
+
+
+def villes():
+    """Liste compacte [(id, nom), ...] triée par nom, gardée en mémoire."""
+    global _villes, _index, _etag
+    if _villes is None:
+        _villes = list(City.objects.order_by('name').values_list('id', 'name'))
+        _index = sorted((' '.join(normaliser(nom)), pk, nom) for pk, nom in _villes)
+        _etag = hashlib.md5(json.dumps(_villes).encode('utf-8')).hexdigest()
+    return _villes
+
+
+def etag():
+    villes()
+    return _etag
+
+
+def autocompleter(prefixe, limite=10):
+    """Villes dont le nom commence par `prefixe` (sans accents ni casse), par recherche dichotomique."""
+    villes()
+    prefixe = ' '.join(normaliser(prefixe))
+    if not prefixe:
+        return []
+    resultats = []
+    for cle, pk, nom in _index[bisect.bisect_left(_index, (prefixe,)):]:
+        if not cle.startswith(prefixe) or len(resultats) >= limite:
+            break
+        resultats.append((pk, nom))
+    return resultats
+
+
+def reinitialiser(**kwargs):
+    global _villes, _index, _etag
+    _villes = _index = _etag = None